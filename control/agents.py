@@ -4,7 +4,7 @@
     @author: Marina Ionova, student of Cybernetics and Robotics at the CTU in Prague
     @contact: marina.ionova@cvut.cz
 """
-from simulation.sim import Sim
+from simulation.sim import Sim, get_agent_kind
 import logging
 
 
@@ -16,16 +16,21 @@ class Agent(Sim):
     :type name: str
     :param tasks: List of tasks assigned to the agent.
     :type tasks: list
+    :param config: Parameters of the simulation, defaults to the config file.
+    :type config: SimConfig
     """
-    def __init__(self, name, tasks=None):
-        super().__init__()
+    def __init__(self, name, tasks=None, config=None):
+        super().__init__(config)
         self.name = name
         self.tasks = tasks
         self.availability = True
         self.current_task = None
         self.available_tasks = []
         self.rejection_tasks = []
+        # Total time by which the current tasks overran their planned finish
         self.delay = 0
+        # Delay of the tasks waiting after the current task which is not applied to their times yet
+        self.pending_delay = 0
         self.waiting = 0
 
     def set_start_task(self, task, start):
@@ -82,8 +87,35 @@ class Agent(Sim):
         :type tasks: list
         """
         self.tasks = tasks
+        # Times of the waiting tasks come from the new schedule
+        self.pending_delay = 0
         self.refresh_task_availability()
 
+    def delay_tasks(self, delay):
+        """
+        Delays the tasks waiting after the current task. The delay is applied to their times by apply_delay.
+
+        :param delay: Delay in time units.
+        :type delay: int
+        """
+        self.delay += delay
+        self.pending_delay += delay
+
+    def apply_delay(self):
+        """
+        Shifts the start and the finish of the tasks waiting after the current task by the pending delay.
+        """
+        if not self.pending_delay:
+            return
+        shift = False
+        for task in self.tasks:
+            if task.status == 1:
+                shift = True
+            elif shift and (task.status == -1 or task.status == 0):
+                task.start += self.pending_delay
+                task.finish += self.pending_delay
+        self.pending_delay = 0
+
     def refresh_task_availability(self):
         """
         Refreshes the list of available tasks.
@@ -93,6 +125,18 @@ class Agent(Sim):
             if task.status == 0:
                 self.available_tasks.append(task)
 
+    def add_available_task(self, task):
+        """
+        Adds a task which became available, the available tasks keep the order of the tasks.
+
+        :param task: Task which became available.
+        :type task: Task
+        """
+        position = self.tasks.index(task)
+        idx = next((i for i, available_task in enumerate(self.available_tasks)
+                    if self.tasks.index(available_task) > position), len(self.available_tasks))
+        self.available_tasks.insert(idx, task)
+
     def get_current_task_idx(self):
         """
         Returns the index of the current task.
@@ -166,7 +210,7 @@ class Agent(Sim):
             self.current_task.status = -1
             self.refresh_task_availability()
         for i, task in enumerate(self.available_tasks):
-            if task.universal and self.name == 'Human':
+            if task.universal and get_agent_kind(self.name) == 'Human':
                 if self.ask_human('execute_task', task):
                     logging.info(f'Human has agreed. Task in progress...')
                     return task
@@ -192,14 +236,17 @@ class Agent(Sim):
         :type job: Job
         :param current_time: Current time.
         :type current_time: int
+        :return: Completion time of the task.
+        :rtype: int
         """
         self.set_start_task(task, current_time)
-        self.set_task_end(self, job, current_time)
-        job.in_progress_tasks.append(task.id)
+        end = self.set_task_end(self, job, current_time)
+        job.refresh_in_progress_task_list(task.id)
         logging.info(f'{task.agent} is doing the task {task.id}. Place object {task.action["Object"]}'
                      f'to {task.action["Place"]}. TIME {current_time}')
+        return end
 
-    def get_feedback(self, job, current_time, coworker):
+    def get_feedback(self, job, current_time, coworkers):
         """
         Sends feedback from an agent.
 
@@ -207,13 +254,14 @@ class Agent(Sim):
         :type job: Job
         :param current_time: Current time.
         :type current_time: int
-        :param coworker: Coworker
-        :type coworker: Agent
+        :param coworkers: Other agents
+        :type coworkers: list
         :return: Feedback from agent.
         :rtype: str
         """
-        self.task_execution[coworker.name] = coworker.task_execution[coworker.name]
-        if self.name == 'Robot':
+        for coworker in coworkers:
+            self.task_execution[coworker.name] = coworker.task_execution[coworker.name]
+        if get_agent_kind(self.name) == 'Robot':
             return self.get_feedback_from_robot(self.current_task, job, current_time)
         else:
             return self.check_human_task(self.current_task, job, current_time)
@@ -0,0 +1,159 @@
+"""
+    BatchSchedule class schedules many job variants concurrently in a pool of processes.
+
+    Run from the repository root, e.g.:
+        python -m control.batch_scheduling --cases 4 5 6 --seed_range 0 100 --workers 4
+"""
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from scheduling import Schedule, PAIRWISE, NO_OVERLAP
+from control.jobs import Job
+import collections
+import argparse
+import logging
+import json
+import time
+import sys
+import os
+
+# Variant of a job, case is a case name or a path to a job file, seed None means the seed of the config
+JobSpec = collections.namedtuple('JobSpec', 'case seed')
+
+
+class BatchSchedule:
+    """
+    Schedules jobs in a pool of processes which is reused for all jobs, so the startup of a process is paid
+    once per worker. In the throughput mode each solver uses a single search worker and the parallelism comes
+    from solving jobs concurrently. At most max_pending jobs are submitted at once, so the memory is bounded
+    regardless of the number of jobs.
+
+    :param workers: Number of processes, defaults to number of CPUs.
+    :type workers: int
+    :param max_pending: Maximal number of jobs submitted to the pool at once, defaults to twice the workers.
+    :type max_pending: int
+    :param agents: Names of the agents of each job.
+    :type agents: list
+    :param throughput: Use a single search worker of the solver for each job.
+    :type throughput: bool
+    :param keep_solution: Return the starts, ends and agents of tasks with each result.
+    :type keep_solution: bool
+    :param schedule_param: Parameters of the Schedule, e.g. formulation or time_limit.
+    :type schedule_param: dict
+    """
+    def __init__(self, workers=None, max_pending=None, agents=None, throughput=True, keep_solution=False,
+                 **schedule_param):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.workers
+        self.agents = agents
+        self.keep_solution = keep_solution
+        self.schedule_param = dict(schedule_param, evaluation_workers=1)
+        if throughput:
+            self.schedule_param.setdefault('solver_workers', 1)
+        self.pool = None
+
+    def run(self, job_specs):
+        """
+        Schedules the jobs and yields the results in the order in which they are finished.
+
+        :param job_specs: Jobs to be scheduled, JobSpec or case names.
+        :type job_specs: iterable
+        :return: Generator of results, see schedule_job.
+        :rtype: generator
+        """
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        job_specs = iter(job_specs)
+        pending = set()
+        while True:
+            for job_spec in job_specs:
+                if not isinstance(job_spec, JobSpec):
+                    job_spec = JobSpec(job_spec, None)
+                pending.add(self.pool.submit(schedule_job, job_spec, self.agents, self.schedule_param,
+                                             self.keep_solution))
+                if len(pending) >= self.max_pending:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+    def close(self):
+        """
+        Shuts down the worker processes.
+        """
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def schedule_job(job_spec, agents, schedule_param, keep_solution=False):
+    """
+    Creates the job and solves its schedule. Runs in a worker process.
+
+    :param job_spec: Job to be scheduled.
+    :type job_spec: JobSpec
+    :param agents: Names of the agents.
+    :type agents: list
+    :param schedule_param: Parameters of the Schedule.
+    :type schedule_param: dict
+    :param keep_solution: Return the starts, ends and agents of tasks.
+    :type keep_solution: bool
+    :return: Case, seed, status, objective, makespan, solver wall time and total wall time of the job.
+    :rtype: dict
+    """
+    start = time.perf_counter()
+    result = {"Case": job_spec.case, "Seed": job_spec.seed, "Status": None, "Objective": None, "Makespan": None,
+              "Solver time": None}
+    try:
+        schedule_model = Schedule(Job(job_spec.case, agents, job_spec.seed), **schedule_param)
+        schedule_model.set_variables()
+        schedule_model.set_constraints()
+        if schedule_model.run_solver() or schedule_model.run_greedy():
+            status, objective, solver_time = schedule_model.rescheduling_run_time[-1][:3]
+            result.update({"Status": status, "Objective": objective, "Solver time": solver_time,
+                           "Makespan": max(schedule_model.solution_hint["End"], default=0)})
+            if keep_solution:
+                result["Solution"] = schedule_model.solution_hint
+        else:
+            result["Status"] = 'INFEASIBLE'
+    except (OSError, ValueError, KeyError) as error:
+        result.update({"Status": 'ERROR', "Error": f'{type(error).__name__}: {error}'})
+    result["Wall time"] = time.perf_counter() - start
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cases', type=str, nargs='+', default=['6'],
+                        help='Cases 1, 2, 3, 4, 5, 6 or paths to job files')
+    seed_group = parser.add_mutually_exclusive_group()
+    seed_group.add_argument('--seeds', type=int, nargs='*', default=[],
+                            help='Seeds of the job variants. Defaults to the seed of the config')
+    seed_group.add_argument('--seed_range', type=int, nargs=2, default=None, metavar=('START', 'STOP'),
+                            help='Range of seeds of the job variants, the stop is excluded')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max_pending', type=int, default=None)
+    parser.add_argument('--formulation', type=str, default=PAIRWISE, choices=[PAIRWISE, NO_OVERLAP])
+    parser.add_argument('--time_limit', type=float, default=10.0)
+    parser.add_argument('--relative_gap', type=float, default=0.0)
+    parser.add_argument('--throughput', action=argparse.BooleanOptionalAction, default=True,
+                        help='Use a single search worker of the solver for each job')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR, format=f"%(levelname)-8s: - %(message)s")
+
+    seeds = (list(range(*args.seed_range)) if args.seed_range else args.seeds) or [None]
+    specs = (JobSpec(case, seed) for case in args.cases for seed in seeds)
+    start = time.perf_counter()
+    count = 0
+    with BatchSchedule(args.workers, args.max_pending, throughput=args.throughput, formulation=args.formulation,
+                       time_limit=args.time_limit, relative_gap=args.relative_gap) as batch:
+        for result in batch.run(specs):
+            count += 1
+            print(json.dumps(result), flush=True)
+    print(f'{count} jobs scheduled in {time.perf_counter() - start:.2f} s', file=sys.stderr)
@@ -5,13 +5,16 @@
     @contact: marina.ionova@cvut.cz
 """
 import threading
+import heapq
 
 import pandas as pd
 
-from visualization import Vis, initial_and_final_schedule, Web_vis
-from scheduling import Schedule, print_schedule
+from visualization import Vis, initial_and_final_schedule, FrameRecorder, REFRESH_RATE
+from scheduling import Schedule, RollingHorizonSchedule, print_schedule
 from control.agents import Agent
 from control.jobs import Job
+from control.online_simulation import OnlineSimulation, TIME_SCALE
+from simulation.sim import get_agent_kind
 import logging
 import json
 import time
@@ -23,19 +26,40 @@ class ControlLogic:
 
     :param case: Case to be executed.
     :type case: str
+    :param agents: Names of the agents, defaults to one human and one robot.
+    :type agents: list
+    :param anytime: Start the execution with the first feasible schedule and swap in the improved ones.
+    :type anytime: bool
+    :param window: Number of tasks in a window of the rolling horizon scheduling, None to solve the whole job.
+    :type window: int
+    :param window_overlap: Number of tasks solved again with the next window.
+    :type window_overlap: int
+    :param config: Parameters of the simulation, defaults to the config file.
+    :type config: SimConfig
+    :param schedule_param: Parameters of the Schedule, e.g. formulation or time_limit.
+    :type schedule_param: dict
     """
-    def __init__(self, case):
+    def __init__(self, case, agents=None, anytime=False, window=None, window_overlap=4, config=None,
+                 **schedule_param):
         self.case = case
-        self.agent_list = ['Robot', 'Human']
+        self.anytime = anytime
+        self.window = window
+        self.window_overlap = window_overlap
+        self.schedule_param = schedule_param
+        self.agent_list = []
         self.agents = None
         self.current_time = 0
         self.start_time = time.time()
         self.task_finish_time = []
         self.schedule_model = None
         self.available_tasks = []
+        # Completion times of the running tasks as (time, agent, task ID) for the event-driven run
+        self.events = []
         self.FAIL = False
 
-        self.job = Job(self.case)
+        self.job = Job(self.case, agents, config=config)
+        # Robots go first, so they take the tasks that they are sure to execute
+        self.agent_list = sorted(self.job.agents, key=lambda agent: get_agent_kind(agent) != 'Robot')
         self.set_schedule()
 
         # self.plot = Vis(horizon=self.schedule_model.horizon)
@@ -45,12 +69,20 @@ class ControlLogic:
         """
         Sets the schedule for task execution by agents.
         """
-        self.schedule_model = Schedule(self.job)
-        schedule = self.schedule_model.set_schedule()
+        if self.window:
+            self.schedule_model = RollingHorizonSchedule(self.job, self.window, self.window_overlap,
+                                                         **self.schedule_param)
+        else:
+            self.schedule_model = Schedule(self.job, **self.schedule_param)
+        if self.anytime:
+            schedule = self.schedule_model.start_anytime_schedule()
+        else:
+            schedule = self.schedule_model.set_schedule()
         if not schedule:
             self.FAIL = True
-        else:
-            self.agents = [Agent(agent_name, schedule[agent_name]) for agent_name in self.agent_list]
+            return
+        self.agents = [Agent(agent_name, schedule[agent_name], self.job.config)
+                       for agent_name in self.agent_list]
         self.set_task_status()
 
     def set_task_status(self):
@@ -65,37 +97,40 @@ class ControlLogic:
     def find_coworker_task(self, agent):
         """
         If the agent has run out of available tasks in his list, he looks for
-        universal tasks in the list of a colleague that he can perform instead
-        of him to speed up the process.
+        universal tasks in the lists of colleagues that he can perform instead
+        of them to speed up the process.
 
         :param agent: Agent to find coworker task for.
         :type agent: Agent
         :return: True if coworker task is found and executed, False otherwise.
         :rtype: bool
         """
-        coworker = self.agents[self.agents.index(agent) - 1]
-        updated_available_tasks = coworker.get_available_universal_tasks()
+        updated_available_tasks = [task for coworker in self.get_coworkers(agent)
+                                   for task in coworker.get_available_universal_tasks() or []] or None
         if updated_available_tasks is not None and updated_available_tasks != self.available_tasks:
             self.available_tasks = updated_available_tasks
+            self.apply_delays()
+            self.swap_schedule(self.schedule_model.finish_anytime_schedule())
             # rescheduling estimation
             self.schedule_model.refresh_variables(self.current_time)
             makespan_and_task = self.schedule_model.set_list_of_possible_changes(self.available_tasks, agent)
             if makespan_and_task and makespan_and_task[0][0] < self.job.get_current_makespan():
-                for coworker_task in makespan_and_task:
-                    if (agent.name == 'Human' and coworker_task[1].id not in agent.rejection_tasks) \
-                            or agent.name == 'Robot':
-                        if agent.ask_human('change_agent', coworker_task[1]):
-                            self.change_agent(coworker_task[1], coworker)
-                            agent.execute_task(coworker_task[1], self.job, self.current_time)
-                            self.update_tasks_status()
-                            if self.plot:
-                                self.plot.update_info(agent, start=True)
-                            return True
-                        else:
-                            agent.rejection_tasks.append(coworker_task[1].id)
+                for _, task in makespan_and_task:
+                    kind = get_agent_kind(agent.name)
+                    coworker_kind = get_agent_kind(task.agent)
+                    if kind == 'Human' and task.id in agent.rejection_tasks:
+                        continue
+                    # Only a human is asked, either to take over the task or to give it up
+                    if kind != coworker_kind and not agent.ask_human('change_agent', task):
+                        if kind == 'Human':
+                            agent.rejection_tasks.append(task.id)
+                        continue
+                    self.change_agent(task, self.get_agent(task.agent), agent)
+                    self.start_task(agent, task)
+                    return True
         return False
 
-    def change_agent(self, task, current_agent):
+    def change_agent(self, task, current_agent, new_agent=None):
         """
         Changes the agent assigned to a task.
 
@@ -103,25 +138,124 @@ class ControlLogic:
         :type task: Task
         :param current_agent: Current agent assigned to the task.
         :type current_agent: Agent
+        :param new_agent: Agent taking over the task, defaults to the coworker of another kind with the fewest
+                          tasks to do.
+        :type new_agent: Agent
         """
-        task.agent = self.agents[self.agents.index(current_agent) - 1].name
+        self.apply_delays()
+        self.swap_schedule(self.schedule_model.finish_anytime_schedule())
+        if new_agent is None:
+            new_agent = min(self.get_coworkers(current_agent),
+                            key=lambda coworker: (get_agent_kind(coworker.name) == get_agent_kind(current_agent.name),
+                                                  sum(1 for coworker_task in coworker.tasks
+                                                      if coworker_task.status in [-1, 0])))
+        task.agent = new_agent.name
         self.schedule_model.set_new_agent(task)
         self.schedule_model.refresh_variables(self.current_time)
         schedule = self.schedule_model.solve()
+        if schedule is None:
+            raise RuntimeError(f'Rescheduling of the task {task.id} to {new_agent.name} failed')
         for agent in self.agents:
             agent.refresh_tasks(schedule[agent.name])
         logging.info('____RESCHEDULING______')
         print_schedule(schedule)
         logging.info('______________________')
 
+    def start_task(self, agent, task):
+        """
+        Starts the execution of the task by the agent and plans the event of its completion.
+
+        :param agent: Agent executing the task.
+        :type agent: Agent
+        :param task: Task to be executed.
+        :type task: Task
+        """
+        end = agent.execute_task(task, self.job, self.current_time)
+        heapq.heappush(self.events, (end, self.agents.index(agent), task.id))
+        self.update_tasks_status()
+
+    def get_next_event_time(self):
+        """
+        Returns the time of the next event which can change the state of the execution. It is the next time unit
+        if an available agent would look for a task again, otherwise the nearest completion of a task.
+
+        :return: Time of the next event.
+        :rtype: int
+        """
+        for agent in self.agents:
+            if agent.availability:
+                if agent.available_tasks:
+                    return self.current_time + 1
+                # Same condition as in find_coworker_task
+                coworker_tasks = [task for coworker in self.get_coworkers(agent)
+                                  for task in coworker.get_available_universal_tasks() or []] or None
+                if coworker_tasks is not None and coworker_tasks != self.available_tasks:
+                    return self.current_time + 1
+
+        # Events of the tasks which were completed or taken over by another agent are outdated
+        while self.events:
+            end, a, task_id = self.events[0]
+            agent = self.agents[a]
+            if not agent.availability and agent.current_task.id == task_id:
+                return max(end, self.current_time + 1)
+            heapq.heappop(self.events)
+        return self.current_time + 1
+
+    def get_agent(self, name):
+        """
+        Returns the agent of the given name.
+
+        :param name: Name of the agent.
+        :type name: str
+        :rtype: Agent
+        """
+        return next(agent for agent in self.agents if agent.name == name)
+
+    def get_coworkers(self, agent):
+        """
+        Returns all agents except the given one.
+
+        :param agent: Agent
+        :type agent: Agent
+        :rtype: list
+        """
+        return [coworker for coworker in self.agents if coworker is not agent]
+
+    def swap_schedule(self, schedule):
+        """
+        Swaps in the improved schedule published by the anytime scheduling.
+
+        :param schedule: Improved schedule, None if there is none.
+        :type schedule: dict
+        """
+        if schedule:
+            for agent in self.agents:
+                agent.refresh_tasks(schedule[agent.name])
+            logging.info('____IMPROVED SCHEDULE______')
+            print_schedule(schedule)
+            logging.info('___________________________')
+
     def update_tasks_status(self):
         """
-        Updates the status of tasks based on their dependencies.
+        Updates the status of tasks whose preceding tasks have all started since the last update.
+        With the debug logging the result is checked against the scan of all tasks.
+        """
+        for task in self.job.dependencies.pop_ready():
+            if task.status == -1:
+                task.status = 0
+                self.get_agent(task.agent).add_available_task(task)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            self.check_tasks_status()
+
+    def check_tasks_status(self):
+        """
+        Scans all tasks for the tasks whose preceding tasks have all started, which the dependency index missed.
         """
         for agent in self.agents:
             for i, task in enumerate(agent.tasks):
                 if len(task.conditions) != 0 and task.status == -1:
                     if set(task.conditions).issubset(self.job.completed_tasks + self.job.in_progress_tasks):
+                        logging.error(f'Task {task.id} is ready, but it is missing in the dependency index')
                         task.status = 0
                         agent.refresh_task_availability()
 
@@ -131,43 +265,52 @@ class ControlLogic:
         """
         for agent in self.agents:
             if not agent.availability:
-                coworker = self.agents[self.agents.index(agent) - 1]
-                status, time_info = agent.get_feedback(self.job, self.current_time, coworker)
+                status, time_info = agent.get_feedback(self.job, self.current_time, self.get_coworkers(agent))
                 logging.debug(f'Status{status}')
                 if status == 'Completed':
                     self.task_completed(agent, time_info)
                 elif status == 'Waiting':
                     agent.waiting = time_info
 
-    def shift_schedule(self):
+    def shift_schedule(self, previous_time=None):
+        """
+        Shifts the schedule forward by each time unit since the previous time in which a task has not been
+        completed in time. The current task is extended, the tasks waiting after it are delayed lazily,
+        see apply_delays.
+
+        :param previous_time: Time of the previous shift, defaults to one time unit ago.
+        :type previous_time: int
         """
-       Shifts the schedule forward by one time unit if a task has been completed.
-       """
+        if previous_time is None:
+            previous_time = self.current_time - 1
         for agent in self.agents:
-            shift = False
-            for task in agent.tasks:
-                if task.status == 1 and task.finish < self.current_time:
-                    task.finish = self.current_time
-                    shift = True
-                elif shift and (task.status == -1 or task.status == 0):
-                    task.start += 1
-                    task.finish += 1
+            task = agent.current_task
+            if not agent.availability and task.finish < self.current_time:
+                agent.delay_tasks(self.current_time - max(task.finish, previous_time))
+                task.finish = self.current_time
+
+    def apply_delays(self):
+        """
+        Applies the pending delays of agents to the times of the waiting tasks before the times are read.
+        """
+        for agent in self.agents:
+            agent.apply_delay()
 
     def task_completed(self, agent, time_info):
         """
         Updates the status of a completed task and logs the completion.
         """
+        agent.apply_delay()
         agent.finish_task(time_info)
         self.job.refresh_completed_task_list(agent.current_task.id)
         logging.info(
             f'TIME {self.current_time}. {agent.name} completed the task {agent.current_task.id}. Progress {self.job.progress()}.')
-        if self.plot:
-            self.plot.update_info(agent)
 
     def schedule_as_dict(self):
         """
         Returns the current schedule as a dictionary.
         """
+        self.apply_delays()
         output = {
             "Status": [],
             "Start": [],
@@ -198,19 +341,55 @@ class ControlLogic:
 
         return output
 
-    def run(self, animation=False, online_plot=False):
+    def get_task_rows(self):
+        """
+        Returns the changing columns of the current schedule for each task, see schedule_as_dict.
+
+        :return: Generator of tasks as (ID, status, start, end, agent).
+        :rtype: generator
+        """
+        self.apply_delays()
+        for agent in self.agents:
+            for task in agent.tasks:
+                yield (task.id, task.status, task.start,
+                       task.finish if isinstance(task.finish, int) else task.finish[0],
+                       f'Assigned\n to {task.agent}' if task.universal else task.agent)
+
+    def run(self, animation=False, online_plot=False, save=True, event_driven=False, refresh_rate=REFRESH_RATE,
+            time_scale=TIME_SCALE, on_step=None):
         """
         Run the scheduling simulation.
+
+        :param animation: Record the states of the simulation for the video.
+        :type animation: bool
+        :param online_plot: Show the simulation in the web visualization, the simulation runs in a worker thread,
+                            see OnlineSimulation.
+        :type online_plot: bool
+        :param save: Save the initial and the final schedule to the json file.
+        :type save: bool
+        :param event_driven: Jump straight to the next event instead of advancing by one time unit. It gives
+                             the same final schedule, the plots always advance by one time unit.
+        :type event_driven: bool
+        :param refresh_rate: Maximal number of refreshes of the web visualization per second, None for no limit.
+        :type refresh_rate: float
+        :param time_scale: Simulated time units per second of the web visualization, None to run as fast
+                           as possible.
+        :type time_scale: float
+        :param on_step: Function called with the ControlLogic after each step of the simulation.
+        :type on_step: callable
         """
-        schedule_data = [self.schedule_as_dict()]
-        if animation:
-            self.plot.delete_existing_file()
         if online_plot:
-            self.plot = Web_vis(data=self.schedule_as_dict())
+            OnlineSimulation(self, time_scale, refresh_rate).run(save=save)
+            return
+        event_driven = event_driven and not animation
+        schedule_data = [self.schedule_as_dict()]
+        recorder = FrameRecorder() if animation else None
+        frame_time = 0
 
         while True:
             if self.job.progress() == 100:
                 break
+            self.swap_schedule(self.schedule_model.get_schedule_update())
             self.check_task_progress()
             for agent in self.agents:
                 logging.debug(f'TIME: {self.current_time}. Is {agent.name} available? {agent.availability}')
@@ -219,36 +398,34 @@ class ControlLogic:
                     if task is None:
                         self.find_coworker_task(agent)
                     else:
-                        agent.execute_task(task, self.job, self.current_time)
-                        self.update_tasks_status()
-                        if self.plot:
-                            self.plot.update_info(agent, start=True)
+                        self.start_task(agent, task)
 
-            self.current_time += 1
-            self.shift_schedule()
+            previous_time = self.current_time
+            self.current_time = self.get_next_event_time() if event_driven else self.current_time + 1
+            self.shift_schedule(previous_time)
 
-            if online_plot:
-                self.plot.current_time = self.current_time
-                self.plot.data = self.schedule_as_dict()
-                self.plot.update_gantt_chart()
-                self.plot.update_dependency_graph()
-                time.sleep(1)
+            if on_step:
+                on_step(self)
 
             if animation:
                 # save current state
-                if self.plot.current_time + 2 == self.current_time:
-                    self.plot.current_time = self.current_time
-                    self.plot.data = self.schedule_as_dict()
-                    self.plot.save_data()
-
+                if frame_time + 2 == self.current_time:
+                    frame_time = self.current_time
+                    self.apply_delays()
+                    recorder.record(self.current_time, {agent.name: agent.tasks_as_dict() for agent in self.agents})
 
+        if recorder:
+            recorder.close()
+        self.apply_delays()
         logging.info('__________FINAL SCHEDULE___________')
         for agent in self.agents:
-            logging.info(agent.name)
+            logging.info(f'{agent.name}, delay {agent.delay}')
             agent.print_tasks()
         logging.info('___________________________________')
         logging.info(f'SIMULATION TOTAL TIME: {time.time() - self.start_time}')
-        schedule_data.append(self.schedule_as_dict())
-        with open(initial_and_final_schedule, 'w') as f:
-            json.dump(schedule_data, f, indent=4)
+        self.schedule_model.close()
+        if save:
+            schedule_data.append(self.schedule_as_dict())
+            with open(initial_and_final_schedule, 'w') as f:
+                json.dump(schedule_data, f, indent=4)
 
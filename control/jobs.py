@@ -6,6 +6,8 @@
     @contact: marina.ionova@cvut.cz
 """
 from inputs import case_generator
+from simulation.duration_table import DurationTable
+from simulation.sim_config import get_config
 import logging
 
 
@@ -13,17 +15,31 @@ class Job:
     """
     A class representing a job consisting of multiple tasks.
 
-    :param case: Input case for generating job description.
+    :param case: Input case for generating job description or path to a json file with the job description.
     :type case: str
+    :param agents: Names of the agents, see get_agent_names. Defaults to one human and one robot.
+    :type agents: list
+    :param seed: Seed of the job variant, it generates the case and the durations of tasks. Defaults to the seed
+                 of the simulation config.
+    :type seed: int
+    :param config: Parameters of the simulation, defaults to the config file.
+    :type config: SimConfig
     """
-    def __init__(self, case):
+    def __init__(self, case, agents=None, seed=None, config=None):
         self.case = case
-        self.job_description = case_generator.set_input(self.case)
+        self.seed = seed
+        self.config = config or get_config()
+        if self.case.endswith('.json'):
+            self.job_description = case_generator.load_input(self.case)
+        else:
+            self.job_description = case_generator.set_input(self.case, self.seed, self.config)
         self.task_sequence = [Task(task) for task in self.job_description]
         self.in_progress_tasks = []
         self.completed_tasks = []
-        self.agents = ["Human", "Robot"]
+        self.agents = list(agents) if agents else get_agent_names()
         self.task_number = len(self.task_sequence)
+        self.duration_tables = {}
+        self.dependencies = DependencyIndex(self.task_sequence)
 
     def __str__(self):
         """
@@ -47,6 +63,26 @@ class Job:
         """
         return max(task.finish if isinstance(task.finish, int) else task.finish[0] for task in self.task_sequence)
 
+    def get_duration_table(self, seed=None, fail_prob=None):
+        """
+        Returns the durations of tasks by each agent. The table is computed once for each seed
+        and fail probability and shared by the schedule, the simulation and the visualization.
+
+        :param seed: Seed of the durations, defaults to the seed of the job.
+        :type seed: int
+        :param fail_prob: Probabilities of the failed and of the successful execution, defaults to the config.
+        :type fail_prob: list
+        :rtype: DurationTable
+        """
+        if seed is None:
+            seed = self.config.seed if self.seed is None else self.seed
+        if fail_prob is None:
+            fail_prob = self.config.fail_probability
+        key = (seed, tuple(fail_prob))
+        if key not in self.duration_tables:
+            self.duration_tables[key] = DurationTable(self.task_sequence, self.agents, seed, fail_prob)
+        return self.duration_tables[key]
+
     def get_task_idx(self, task):
         """
         Returns the index of a specified task in the job's task sequence.
@@ -58,6 +94,16 @@ class Job:
         """
         return self.task_sequence.index(task)
 
+    def refresh_in_progress_task_list(self, task_id):
+        """
+        Adds a started task to the job's in-progress task list.
+
+        :param task_id: ID of started task.
+        :type task_id: int
+        """
+        self.in_progress_tasks.append(task_id)
+        self.dependencies.start(task_id)
+
     def refresh_completed_task_list(self, task_id):
         """
         Adds a completed task to the job's completed task list and removes it from the in-progress task list.
@@ -67,6 +113,95 @@ class Job:
         """
         self.completed_tasks.append(task_id)
         self.in_progress_tasks.remove(task_id)
+        self.dependencies.complete(task_id)
+
+
+class DependencyIndex:
+    """
+    Index of the dependencies between tasks which is updated when a task starts or completes, instead of scanning
+    all tasks. A task is ready when all its preceding tasks have started.
+
+    :param tasks: Sequence of tasks.
+    :type tasks: list
+    """
+    def __init__(self, tasks):
+        self.tasks = {task.id: task for task in tasks}
+        self.position = {task.id: i for i, task in enumerate(tasks)}
+        # Reverse edges from a task to the tasks depending on it
+        self.successors = {task.id: [] for task in tasks}
+        self.remaining = {}
+        self.in_progress = {task.id: set() for task in tasks}
+        # Tasks whose preceding tasks have all started since the last call of pop_ready
+        self.ready = []
+        for task in tasks:
+            conditions = set(task.conditions)
+            self.remaining[task.id] = len(conditions)
+            for condition in conditions:
+                if condition in self.successors:
+                    self.successors[condition].append(task.id)
+
+    def start(self, task_id):
+        """
+        Updates the dependent tasks of the started task.
+
+        :param task_id: ID of started task.
+        :type task_id: int
+        """
+        for successor in self.successors.get(task_id, []):
+            self.remaining[successor] -= 1
+            self.in_progress[successor].add(task_id)
+            if self.remaining[successor] == 0:
+                self.ready.append(self.tasks[successor])
+
+    def complete(self, task_id):
+        """
+        Updates the dependent tasks of the completed task.
+
+        :param task_id: ID of completed task.
+        :type task_id: int
+        """
+        for successor in self.successors.get(task_id, []):
+            self.in_progress[successor].discard(task_id)
+
+    def pop_ready(self):
+        """
+        Returns the tasks which became ready since the last call.
+
+        :rtype: list
+        """
+        ready, self.ready = self.ready, []
+        return ready
+
+    def get_in_progress_condition(self, task):
+        """
+        Returns the first preceding task of the task in the sequence of tasks which is in progress.
+
+        :param task: Task
+        :type task: Task
+        :return: Preceding task in progress, None if there is none.
+        :rtype: Task
+        """
+        in_progress = self.in_progress.get(task.id)
+        if not in_progress:
+            return None
+        return self.tasks[min(in_progress, key=self.position.get)]
+
+
+def get_agent_names(humans=1, robots=1):
+    """
+    Returns the names of the agents. Agents of the same kind are numbered if there are more of them.
+
+    :param humans: Number of human agents.
+    :type humans: int
+    :param robots: Number of robot agents.
+    :type robots: int
+    :return: Names of the agents, e.g. ['Human', 'Robot 1', 'Robot 2'].
+    :rtype: list
+    """
+    names = []
+    for kind, count in [("Human", humans), ("Robot", robots)]:
+        names += [kind] if count == 1 else [f'{kind} {k}' for k in range(1, count + 1)]
+    return names
 
 
 class Task:
@@ -83,6 +218,7 @@ class Task:
         self.conditions = task_description['Conditions']
         self.universal = task_description['Agent'] == 'Both'
         self.agent = task_description['Agent']
+        self.reject_prob = task_description['Reject probability']
         self.start = None
         self.finish = None
 
@@ -112,16 +248,12 @@ class Task:
 
     def get_reject_prob(self):
         """
-       Returns the probability of task rejection based on task ID.
+       Returns the probability of task rejection from the job description.
 
        :return: Probability of task rejection.
        :rtype: float
        """
-        task_rejection_prob = {0: 0.1, 1: 0.2, 2: 0.1, 3: 0.8,
-                               4: 0.2, 5: 0.2, 6: 0.2, 7: 0.1,
-                               8: 0.2, 9: 0.8, 10: 0.2, 11: 0.2,
-                               12: 0.1, 13: 0.2, 14: 0.1, 15: 0.2}
-        return task_rejection_prob[self.id]
+        return self.reject_prob
 
     def as_dict(self):
         """
@@ -0,0 +1,204 @@
+"""
+    MonteCarloSimulation class executes a job for many seeds in a pool of processes and aggregates the results.
+
+    Run from the repository root, e.g.:
+        python -m control.monte_carlo --case 6 --seeds 0 1000 --workers 4 --output results.npz
+"""
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from scheduling import PAIRWISE, NO_OVERLAP
+from simulation.sim_config import get_config
+from control.control_logic import ControlLogic
+from control.jobs import get_agent_names
+import numpy as np
+import argparse
+import logging
+import time
+import sys
+import os
+
+# Results of a single simulation, in the order returned by simulate_job
+METRICS = ('makespan', 'reschedules', 'rejections', 'solver_time', 'idle_time', 'delay')
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class MonteCarloSimulation:
+    """
+    Executes the job with the event-driven ControlLogic for each seed, without plotting and without saving
+    the schedules. The seed overrides the seed of the simulation config, so it changes the generated case,
+    the durations of tasks and the answers of humans. The pool of processes is reused for all runs and at most
+    max_pending runs are submitted at once.
+
+    :param workers: Number of processes, defaults to number of CPUs.
+    :type workers: int
+    :param max_pending: Maximal number of runs submitted to the pool at once, defaults to twice the workers.
+    :type max_pending: int
+    :param agents: Names of the agents of the job.
+    :type agents: list
+    :param throughput: Use a single search worker of the solver for each run.
+    :type throughput: bool
+    :param config: Parameters of the simulation, defaults to the config file.
+    :type config: SimConfig
+    :param control_param: Parameters of the ControlLogic and of the Schedule, e.g. window or time_limit.
+    :type control_param: dict
+    """
+    def __init__(self, workers=None, max_pending=None, agents=None, throughput=True, config=None,
+                 **control_param):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.workers
+        self.agents = agents
+        self.config = config or get_config()
+        self.control_param = dict(control_param, evaluation_workers=1)
+        if throughput:
+            self.control_param.setdefault('solver_workers', 1)
+        self.pool = None
+
+    def run(self, case, seeds):
+        """
+        Executes the case for each seed.
+
+        :param case: Case to be executed.
+        :type case: str
+        :param seeds: Seeds of the runs.
+        :type seeds: list
+        :return: Array of seeds and an array of each metric in the order of the seeds, NaN for a failed run.
+        :rtype: dict
+        """
+        if self.pool is None:
+            # Logging of every step would dominate the run time of the workers
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=logging.disable,
+                                            initargs=(logging.INFO,))
+        seeds = np.asarray(seeds, dtype=int)
+        results = np.full((len(seeds), len(METRICS)), np.nan)
+        runs = iter(enumerate(seeds))
+        pending = {}
+        while True:
+            for i, seed in runs:
+                future = self.pool.submit(simulate_job, case, self.config.override(seed=int(seed)), self.agents,
+                                          self.control_param)
+                pending[future] = i
+                if len(pending) >= self.max_pending:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+
+        output = {'seeds': seeds}
+        output.update({metric: results[:, m] for m, metric in enumerate(METRICS)})
+        return output
+
+    def close(self):
+        """
+        Shuts down the worker processes.
+        """
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def simulate_job(case, config, agents, control_param):
+    """
+    Executes the job once. Runs in a worker process.
+
+    :param case: Case to be executed.
+    :type case: str
+    :param config: Parameters of the simulation.
+    :type config: SimConfig
+    :param agents: Names of the agents.
+    :type agents: list
+    :param control_param: Parameters of the ControlLogic and of the Schedule.
+    :type control_param: dict
+    :return: Makespan, number of reschedules, number of rejected tasks, solver time, idle time of agents and
+             delay of agents, NaN if the scheduling or the rescheduling of the job failed.
+    :rtype: tuple
+    """
+    control_logic = None
+    try:
+        control_logic = ControlLogic(case, agents, config=config, **control_param)
+        if control_logic.FAIL:
+            control_logic.schedule_model.close()
+            return (np.nan,) * len(METRICS)
+        control_logic.run(save=False, event_driven=True)
+    except RuntimeError as error:
+        logging.error(f'Seed {config.seed}: {error}')
+        if control_logic is not None:
+            control_logic.schedule_model.close()
+        return (np.nan,) * len(METRICS)
+
+    makespan = control_logic.job.get_current_makespan()
+    # The first run is the initial schedule
+    run_time = control_logic.schedule_model.rescheduling_run_time
+    busy_time = sum(task.finish[0] - task.start for agent in control_logic.agents for task in agent.tasks)
+    return (makespan, len(run_time) - 1, sum(len(agent.rejection_tasks) for agent in control_logic.agents),
+            sum(run[2] for run in run_time), makespan * len(control_logic.agents) - busy_time,
+            sum(agent.delay for agent in control_logic.agents))
+
+
+def summarize(results, percentiles=PERCENTILES):
+    """
+    Returns the percentiles of each metric over the successful runs.
+
+    :param results: Results of MonteCarloSimulation.run.
+    :type results: dict
+    :param percentiles: Percentiles to be computed.
+    :type percentiles: tuple
+    :return: Array of the percentiles for each metric.
+    :rtype: dict
+    """
+    return {metric: np.nanpercentile(results[metric], percentiles) if not np.isnan(results[metric]).all()
+            else np.full(len(percentiles), np.nan) for metric in METRICS}
+
+
+def save_results(path, case, results, percentiles=PERCENTILES):
+    """
+    Saves the results and their percentiles to a compressed npz file.
+
+    :param path: Path to the npz file.
+    :type path: str
+    :param case: Executed case.
+    :type case: str
+    :param results: Results of MonteCarloSimulation.run.
+    :type results: dict
+    :param percentiles: Percentiles to be saved.
+    :type percentiles: tuple
+    """
+    summary = {f'{metric}_percentiles': value for metric, value in summarize(results, percentiles).items()}
+    np.savez_compressed(path, case=case, percentiles=np.asarray(percentiles), **results, **summary)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--case', type=str, default='6', choices=['1', '2', '3', '4', '5', '6'])
+    parser.add_argument('--seeds', type=int, nargs=2, default=[0, 100], help='Range of seeds')
+    parser.add_argument('--humans', type=int, default=1)
+    parser.add_argument('--robots', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max_pending', type=int, default=None)
+    parser.add_argument('--formulation', type=str, default=PAIRWISE, choices=[PAIRWISE, NO_OVERLAP])
+    parser.add_argument('--time_limit', type=float, default=10.0)
+    parser.add_argument('--window', type=int, default=None)
+    parser.add_argument('--output', type=str, default=None, help='Path to the npz file with the results')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR, format=f"%(levelname)-8s: - %(message)s")
+
+    start = time.perf_counter()
+    with MonteCarloSimulation(args.workers, args.max_pending, get_agent_names(args.humans, args.robots),
+                              window=args.window, formulation=args.formulation,
+                              time_limit=args.time_limit) as monte_carlo:
+        results = monte_carlo.run(args.case, range(*args.seeds))
+    failed = int(np.isnan(results['makespan']).sum())
+    print(f'{len(results["seeds"])} runs of case {args.case} in {time.perf_counter() - start:.2f} s, '
+          f'{failed} failed', file=sys.stderr)
+    print('metric'.ljust(12) + ''.join(f'p{p}'.rjust(10) for p in PERCENTILES))
+    for metric, value in summarize(results).items():
+        print(metric.ljust(12) + ''.join(f'{v:10.2f}' for v in value))
+    if args.output:
+        save_results(args.output, args.case, results)
+        print(f'Results saved to {args.output}', file=sys.stderr)
@@ -0,0 +1,197 @@
+"""
+    OnlineSimulation class executes the job in a worker thread and shows its snapshots in the web visualization.
+"""
+from collections import namedtuple
+import threading
+import logging
+import queue
+import time
+
+from visualization import Web_vis, REFRESH_RATE
+
+# Simulated time units per second of the wall-clock time
+TIME_SCALE = 1.0
+# Maximal number of snapshots waiting for the web visualization, older snapshots are dropped
+QUEUE_SIZE = 8
+# Time in seconds for which the web visualization waits for a snapshot before it checks the worker
+POLL_TIMEOUT = 0.1
+
+# State of the execution: current time, tasks as (ID, status, start, end, agent), None if they have not changed
+# since the previous snapshot, and current task of each agent as (object, place, ID), None for a waiting agent
+Snapshot = namedtuple('Snapshot', 'time rows agents')
+
+
+class SimulationStopped(Exception):
+    """
+    Stops the worker thread when the web visualization has ended.
+    """
+
+
+class OnlineSimulation:
+    """
+    Executes the ControlLogic in a worker thread, which publishes a snapshot after each time unit to a bounded
+    queue. The Streamlit script thread samples the latest snapshot at the refresh rate of the web visualization,
+    so rendering never delays the scheduling decisions. If the queue is full, the oldest snapshot is dropped
+    instead of waiting for the web visualization. The tasks are read only when the refresh is due or the status
+    or the delay of a task may have changed, other snapshots carry just the time and the agents.
+
+    :param control_logic: ControlLogic of the job.
+    :type control_logic: ControlLogic
+    :param time_scale: Simulated time units per second, None to run as fast as possible.
+    :type time_scale: float
+    :param refresh_rate: Maximal number of refreshes of the web visualization per second, None for no limit.
+    :type refresh_rate: float
+    :param queue_size: Maximal number of snapshots waiting for the web visualization.
+    :type queue_size: int
+    """
+    def __init__(self, control_logic, time_scale=TIME_SCALE, refresh_rate=REFRESH_RATE, queue_size=QUEUE_SIZE):
+        self.control_logic = control_logic
+        self.time_scale = time_scale
+        self.refresh_rate = refresh_rate
+        self.snapshots = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+        self.start_time = None
+        self.error = None
+        # State of the execution and wall-clock time of the last snapshot with the tasks
+        self.state = None
+        self.rows_time = None
+
+    def run(self, save=True):
+        """
+        Executes the job and shows it in the web visualization until the job is completed.
+
+        :param save: Save the initial and the final schedule to the json file.
+        :type save: bool
+        """
+        plot = Web_vis(data=self.control_logic.schedule_as_dict(), refresh_rate=self.refresh_rate,
+                       agents=[agent.name for agent in self.control_logic.agents])
+        worker = threading.Thread(target=self.simulate, args=(save,), name='simulation', daemon=True)
+        self.start_time = time.monotonic()
+        worker.start()
+        try:
+            while worker.is_alive() or not self.snapshots.empty():
+                time.sleep(plot.get_wait_time())
+                snapshot = self.get_snapshot(POLL_TIMEOUT)
+                if snapshot is not None:
+                    plot.refresh(snapshot.time, snapshot.rows or [], force=True)
+                    for name, task in snapshot.agents.items():
+                        plot.update_agent(name, task)
+        finally:
+            # The worker stops at the next time unit if the script thread has been interrupted
+            self.stopped.set()
+            worker.join()
+        if self.error is not None:
+            raise self.error
+
+    def simulate(self, save):
+        """
+        Executes the job and publishes its snapshots. Runs in the worker thread.
+
+        :param save: Save the initial and the final schedule to the json file.
+        :type save: bool
+        """
+        try:
+            self.control_logic.run(save=save, on_step=self.publish)
+            self.publish(self.control_logic, pace=False, force=True)
+        except SimulationStopped:
+            logging.info('Simulation has been stopped')
+            self.control_logic.schedule_model.close()
+        except Exception as error:
+            self.error = error
+
+    def publish(self, control_logic, pace=True, force=False):
+        """
+        Publishes the snapshot of the execution and waits until the wall-clock time of the current time.
+
+        :param control_logic: ControlLogic of the job.
+        :type control_logic: ControlLogic
+        :param pace: Wait according to the time scale.
+        :type pace: bool
+        :param force: Publish the tasks even if they have not changed, e.g. for the final schedule.
+        :type force: bool
+        """
+        if self.stopped.is_set():
+            raise SimulationStopped()
+        state = get_state(control_logic)
+        rows = None
+        if force or state != self.state or self.is_refresh_due():
+            rows = self.get_rows(control_logic, state)
+        snapshot = Snapshot(control_logic.current_time, rows,
+                            {agent.name: None if agent.availability else
+                             (agent.current_task.action['Object'], agent.current_task.action['Place'],
+                              agent.current_task.id) for agent in control_logic.agents})
+        while True:
+            try:
+                self.snapshots.put_nowait(snapshot)
+                break
+            except queue.Full:
+                try:
+                    dropped = self.snapshots.get_nowait()
+                except queue.Empty:
+                    continue
+                # The dropped tasks are replaced by the current ones
+                if dropped.rows is not None and snapshot.rows is None:
+                    snapshot = snapshot._replace(rows=self.get_rows(control_logic, state))
+        if pace and self.time_scale:
+            self.stopped.wait(max(0.0, self.start_time + control_logic.current_time / self.time_scale -
+                                  time.monotonic()))
+
+    def is_refresh_due(self):
+        """
+        Returns whether the web visualization is due to refresh the tasks.
+
+        :rtype: bool
+        """
+        return self.refresh_rate is None or self.rows_time is None or \
+            time.monotonic() - self.rows_time >= 1 / self.refresh_rate
+
+    def get_rows(self, control_logic, state):
+        """
+        Returns the tasks of the snapshot and remembers the state of the execution they belong to.
+
+        :param control_logic: ControlLogic of the job.
+        :type control_logic: ControlLogic
+        :param state: State of the execution, see get_state.
+        :type state: tuple
+        :return: Tasks as (ID, status, start, end, agent).
+        :rtype: list
+        """
+        self.state = state
+        self.rows_time = time.monotonic()
+        return list(control_logic.get_task_rows())
+
+    def get_snapshot(self, timeout):
+        """
+        Waits for a snapshot and returns the latest one, the older snapshots are skipped. The latest snapshot
+        keeps the tasks of the skipped ones if it has none.
+
+        :param timeout: Time in seconds to wait for a snapshot.
+        :type timeout: float
+        :return: Latest snapshot, None if there is none.
+        :rtype: Snapshot
+        """
+        try:
+            snapshot = self.snapshots.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        while True:
+            try:
+                newer = self.snapshots.get_nowait()
+            except queue.Empty:
+                return snapshot
+            snapshot = newer if newer.rows is not None else newer._replace(rows=snapshot.rows)
+
+
+def get_state(control_logic):
+    """
+    Returns the cheap summary of the execution which changes whenever the status or the delay of a task may
+    have changed: the schedule, the current task, the delay and the available tasks of each agent and the number
+    of the completed tasks.
+
+    :param control_logic: ControlLogic of the job.
+    :type control_logic: ControlLogic
+    :rtype: tuple
+    """
+    return (len(control_logic.job.completed_tasks),) + tuple(
+        (id(agent.tasks), agent.current_task.id if agent.current_task else None, agent.availability, agent.delay,
+         len(agent.available_tasks)) for agent in control_logic.agents)
@@ -1,4 +1,4 @@
-from simulation import sim_param_path
+from simulation.sim_config import get_config
 import numpy as np
 import json
 
@@ -25,18 +25,24 @@ CONDITIONS = {'2': [[4], [5], [6], [7],
                     [8, 9], [8, 9, 10], [9, 10, 11], [10, 11],
                     [12, 13], [12, 13, 14], [13, 14, 15], [14, 15],
                     [], [], [], [], []]}
+# Probabilities of the rejection of a task by the human in the built-in cases by task ID
+REJECT_PROBABILITY = {0: 0.1, 1: 0.2, 2: 0.1, 3: 0.8,
+                      4: 0.2, 5: 0.2, 6: 0.2, 7: 0.1,
+                      8: 0.2, 9: 0.8, 10: 0.2, 11: 0.2,
+                      12: 0.1, 13: 0.2, 14: 0.1, 15: 0.2}
+# Probability of the rejection of a task of a loaded job which does not set it
+DEFAULT_REJECT_PROBABILITY = 0.2
 X = ['A', 'B', 'C', 'D']
 Y = ['1', '2', '3', '4']
 
 
-def set_random_sequence(case, length):
-    with open(sim_param_path) as f:
-        param = json.load(f)
+def set_random_sequence(case, length, seed=None, config=None):
+    config = config or get_config()
     if case in ['1', '2', '3']:
         weights = (0.5, 0.5, 0)
     else:
-        weights = param["Allocation weights"]
-    np.random.seed(param['Seed'])
+        weights = config.allocation_weights
+    np.random.seed(config.seed if seed is None else seed)
     weights_for_each_task = []
     for weight in weights:
         if weight != 0:
@@ -54,10 +60,10 @@ def set_random_sequence(case, length):
     return sequence
 
 
-def set_input(case):
+def set_input(case, seed=None, config=None):
     job_description = []
     ID_counter = 0
-    cubes_sequence = set_random_sequence(case, CASES_LENGTH)
+    cubes_sequence = set_random_sequence(case, CASES_LENGTH, seed, config)
 
     for x in X:
         for y in Y:
@@ -75,9 +81,27 @@ def set_input(case):
                 task_description['Conditions'] = []
             else:
                 task_description['Conditions'] = CONDITIONS[case][ID_counter]
+            task_description['Reject probability'] = REJECT_PROBABILITY[ID_counter]
             ID_counter += 1
             job_description.append(task_description)
     return job_description
 
 
+def load_input(path):
+    """
+    Loads the job description from a json file, a list of tasks in the format of set_input, or a dictionary
+    with the list of tasks in "Tasks" and the "Reject probability" of its tasks. The reject probability of
+    a task is read from the task, then from the job and defaults to DEFAULT_REJECT_PROBABILITY.
+    """
+    with open(path) as f:
+        job = json.load(f)
+    if isinstance(job, dict):
+        tasks, reject_prob = job['Tasks'], job.get('Reject probability', DEFAULT_REJECT_PROBABILITY)
+    else:
+        tasks, reject_prob = job, DEFAULT_REJECT_PROBABILITY
+    for task_description in tasks:
+        task_description.setdefault('Reject probability', reject_prob)
+    return tasks
+
+
 
@@ -1,8 +1,11 @@
-from scheduling.scheduling_split_tasks import Schedule, schedule_as_dict
+from scheduling.scheduling_split_tasks import Schedule, schedule_as_dict, PAIRWISE, NO_OVERLAP
+from scheduling.schedule_cache import ScheduleCache, CACHE_DIRECTORY
+from scheduling.rolling_horizon import RollingHorizonSchedule
 from control.control_logic import ControlLogic
+from control.online_simulation import TIME_SCALE
 from visualization.json_2_video import video_parser
-from visualization import schedule, Vis
-from control.jobs import Job
+from visualization import schedule, Vis, REFRESH_RATE
+from control.jobs import Job, get_agent_names
 import argparse
 import logging
 import json
@@ -15,7 +18,32 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("case", type=str, help='Choose one of this: 1, 2, 3, 4, 5, 6')
     parser.add_argument('--only_schedule', action=argparse.BooleanOptionalAction)
+    parser.add_argument('--formulation', type=str, default=PAIRWISE, choices=[PAIRWISE, NO_OVERLAP],
+                        help='Scheduling model formulation')
+    parser.add_argument('--anytime', action=argparse.BooleanOptionalAction,
+                        help='Start with the first feasible schedule and swap in the improved ones')
+    parser.add_argument('--time_limit', type=float, default=10.0, help='Time limit of the solver in seconds')
+    parser.add_argument('--relative_gap', type=float, default=0.0,
+                        help='Stop the solver when the relative gap to the best bound is below this limit')
+    parser.add_argument('--cache', action=argparse.BooleanOptionalAction,
+                        help='Reuse the schedule of an unchanged job from the previous runs')
+    parser.add_argument('--cache_directory', type=str, default=CACHE_DIRECTORY,
+                        help='Directory of the cached schedules')
+    parser.add_argument('--window', type=int, default=None,
+                        help='Number of tasks in a window of the rolling horizon scheduling')
+    parser.add_argument('--window_overlap', type=int, default=4,
+                        help='Number of tasks solved again with the next window')
+    parser.add_argument('--humans', type=int, default=1, help='Number of human agents')
+    parser.add_argument('--robots', type=int, default=1, help='Number of robot agents')
     parser.add_argument('--offline', action=argparse.BooleanOptionalAction)
+    parser.add_argument('--event_driven', action=argparse.BooleanOptionalAction,
+                        help='Jump straight to the next event of the offline simulation instead of each time unit')
+    parser.add_argument('--record', action=argparse.BooleanOptionalAction,
+                        help='Record the frames of the offline simulation for the video')
+    parser.add_argument('--refresh_rate', type=float, default=REFRESH_RATE,
+                        help='Maximal number of refreshes of the web visualization per second')
+    parser.add_argument('--time_scale', type=float, default=TIME_SCALE,
+                        help='Simulated time units per second of the web visualization, 0 to run as fast as possible')
     parser.add_argument('--log_error', action=argparse.BooleanOptionalAction)
     parser.add_argument('--log_debug', action=argparse.BooleanOptionalAction)
 
@@ -36,24 +64,43 @@ if __name__ == '__main__':
     else:
         logging.error("The case does not exist")
         raise SystemExit(1)
+    cache = ScheduleCache(directory=args.cache_directory) if args.cache else None
+    agents = get_agent_names(args.humans, args.robots)
 
     if not args.only_schedule:
-        execute_job = ControlLogic(case)
+        execute_job = ControlLogic(case, agents, anytime=args.anytime, window=args.window,
+                                   window_overlap=args.window_overlap, formulation=args.formulation,
+                                   time_limit=args.time_limit, relative_gap=args.relative_gap, cache=cache)
+        if execute_job.FAIL:
+            raise SystemExit(1)
         if args.offline:
-            execute_job.run()
+            execute_job.run(animation=args.record, event_driven=args.event_driven)
         else:
-            execute_job.run(online_plot=True)
+            execute_job.run(online_plot=True, refresh_rate=args.refresh_rate, time_scale=args.time_scale)
 
     else:
-        job = Job(case)
-        schedule_model = Schedule(job)
-        output = schedule_model.set_schedule()
+        job = Job(case, agents)
+        if args.window:
+            schedule_model = RollingHorizonSchedule(job, args.window, args.window_overlap,
+                                                    formulation=args.formulation, time_limit=args.time_limit,
+                                                    relative_gap=args.relative_gap)
+        else:
+            schedule_model = Schedule(job, args.formulation, time_limit=args.time_limit,
+                                      relative_gap=args.relative_gap, cache=cache)
+        if args.anytime:
+            output = schedule_model.set_schedule(
+                on_solution=lambda solution: logging.info(f'Solution: objective {solution["Objective"]}, '
+                                                          f'wall time {solution["Wall time"]:.4f} s'))
+        else:
+            output = schedule_model.set_schedule()
+        if output is None:
+            raise SystemExit(1)
         with open(schedule, "w") as outfile:
             json.dump(schedule_as_dict(output), outfile)
             logging.info(f'Save data to {schedule}')
         save_file_name = 'schedule.png'
 
-        gantt = Vis(data=schedule_as_dict(output), from_file=True)
+        gantt = Vis(data=schedule_as_dict(output), from_file=True, duration_table=job.get_duration_table())
         gantt.plot_schedule(save_file_name)
         logging.info(f'Save picture to ./img/{save_file_name}')
 
@@ -1,20 +1,33 @@
 import argparse
 import json
+import logging
+import sys
 import time
 
 import numpy as np
 
-from visualization import Vis, initial_and_final_schedule, schedule, video_parser
+from visualization import Vis, initial_and_final_schedule, schedule, export_video
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("mode", type=str,
                         help='Select the simulation you want to render: sim_vis or plot_schedule')
+    parser.add_argument("--workers", type=int, default=None, help='Number of processes rendering the video')
+    parser.add_argument("--stride", type=int, default=1, help='Render every stride-th frame of the video')
+    parser.add_argument("--fps", type=int, default=1)
+    parser.add_argument("--output", type=str, default='growingCoil.mp4', help='Path to the video')
     args = parser.parse_args()
 
     save_file_name = ''
     if args.mode == "video":
-        video_parser()
+        logging.basicConfig(level=logging.INFO, format=f"%(levelname)-8s: - %(message)s")
+        try:
+            path = export_video(output=args.output, workers=args.workers, stride=args.stride, fps=args.fps)
+            logging.info(f'Saved to {path}')
+        except ValueError as error:
+            logging.error(error)
+            sys.exit(1)
+        sys.exit()
     elif args.mode == "sim_vis":
         with open(initial_and_final_schedule, "r+") as json_file:
             data = json.load(json_file)
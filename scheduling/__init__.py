@@ -1,2 +1,5 @@
 from scheduling.scheduling_split_tasks import Schedule
 from scheduling.scheduling_split_tasks import print_schedule
+from scheduling.scheduling_split_tasks import PAIRWISE, NO_OVERLAP
+from scheduling.schedule_cache import ScheduleCache
+from scheduling.rolling_horizon import RollingHorizonSchedule
@@ -0,0 +1,132 @@
+"""
+    Benchmarks of the scheduling model.
+
+    Run from the repository root, e.g.:
+        python -m scheduling.benchmark candidates --case 6
+        python -m scheduling.benchmark agents --case 6 --max_agents 6
+"""
+from ortools.sat.python import cp_model
+from scheduling.scheduling_split_tasks import Schedule, PAIRWISE, NO_OVERLAP
+from control.jobs import Job, get_agent_names
+import argparse
+import logging
+import time
+import copy
+
+
+def evaluate_with_deepcopy(schedule_model, idx, agent):
+    """
+    Evaluates the redirection of the task by copying the model and deactivating the constraint of its agent.
+
+    :param schedule_model: Solved schedule model with fixed agents.
+    :type schedule_model: Schedule
+    :param idx: Index of the task.
+    :type idx: int
+    :param agent: Name of the agent the task is redirected to.
+    :type agent: str
+    :return: Objective value, None if no solution has been found.
+    :rtype: float
+    """
+    test_model = copy.deepcopy(schedule_model.model)
+    agent_bool_copy = copy.deepcopy(schedule_model.agent_bool)
+    schedule_model.constraints.copy(test_model).deactivate(('fix_agent', idx))
+    test_model.Add(agent_bool_copy[idx][schedule_model.job.agents.index(agent)] == True)
+    test_model.Proto().assumptions[:] = [literal.Index() for literal in schedule_model.get_assumptions(idx, agent)]
+    solver = cp_model.CpSolver()
+    status = solver.Solve(test_model)
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        return solver.ObjectiveValue()
+    return None
+
+
+def candidates_benchmark(case, formulation, repeats):
+    """
+    Compares the latency of the evaluation of one possible change with the copied model and with assumptions.
+
+    :param case: Case to be scheduled.
+    :type case: str
+    :param formulation: Scheduling model formulation.
+    :type formulation: str
+    :param repeats: Number of evaluations of each candidate.
+    :type repeats: int
+    """
+    schedule_model = Schedule(Job(case), formulation, evaluation_workers=1)
+    schedule_model.set_schedule()
+    candidates = [i for i, task in enumerate(schedule_model.job.task_sequence) if task.universal]
+    if len(candidates) == 0:
+        print(f'Case {case} has no allocatable tasks')
+        return
+
+    deepcopy_time, assumptions_time = 0, 0
+    for idx in candidates:
+        task = schedule_model.job.task_sequence[idx]
+        agent = next(agent for agent in schedule_model.job.agents if agent != task.agent)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            deepcopy_result = evaluate_with_deepcopy(schedule_model, idx, agent)
+            deepcopy_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            result = schedule_model.evaluate_change(idx, agent, schedule_model.evaluation_time_budget)
+            assumptions_time += time.perf_counter() - start
+
+            if (result and result[0]) != deepcopy_result:
+                logging.warning(f'Task {idx}: objective {result and result[0]} differs from {deepcopy_result}')
+
+    evaluations = len(candidates) * repeats
+    print(f'Case {case}, {formulation}, {len(candidates)} candidates x {repeats}')
+    print(f'  deepcopy    : {1000 * deepcopy_time / evaluations:8.2f} ms per candidate')
+    print(f'  assumptions : {1000 * assumptions_time / evaluations:8.2f} ms per candidate')
+    print(f'  speed-up    : {deepcopy_time / assumptions_time:8.2f}x')
+
+
+def agents_benchmark(case, formulation, max_agents, time_limit):
+    """
+    Measures the time of building and solving the model of the case for a growing number of agents.
+    Agents are added alternately as robots and humans.
+
+    :param case: Case to be scheduled.
+    :type case: str
+    :param formulation: Scheduling model formulation.
+    :type formulation: str
+    :param max_agents: The highest number of agents.
+    :type max_agents: int
+    :param time_limit: Time limit of the solver in seconds.
+    :type time_limit: float
+    """
+    print(f'Case {case}, {formulation}, time limit {time_limit} s')
+    print(f'{"agents":>8} {"variables":>10} {"constraints":>12} {"build [ms]":>11} {"solve [s]":>10} '
+          f'{"objective":>10}  status')
+    for agent_number in range(2, max_agents + 1):
+        humans = agent_number // 2
+        schedule_model = Schedule(Job(case, get_agent_names(humans, agent_number - humans)), formulation,
+                                  time_limit=time_limit, evaluation_workers=1)
+        start = time.perf_counter()
+        schedule_model.set_variables()
+        schedule_model.set_constraints()
+        build_time = time.perf_counter() - start
+        schedule_model.run_solver()
+        model = schedule_model.model.Proto()
+        print(f'{agent_number:>8} {len(model.variables):>10} {len(model.constraints):>12} '
+              f'{1000 * build_time:>11.1f} {schedule_model.solver.WallTime():>10.3f} '
+              f'{schedule_model.solver.ObjectiveValue():>10.0f}  {schedule_model.solver.StatusName(schedule_model.status)}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("benchmark", type=str, help='Select the benchmark: candidates, agents')
+    parser.add_argument('--case', type=str, default='6', help='Choose one of this: 1, 2, 3, 4, 5, 6')
+    parser.add_argument('--formulation', type=str, default=PAIRWISE, choices=[PAIRWISE, NO_OVERLAP])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--max_agents', type=int, default=6)
+    parser.add_argument('--time_limit', type=float, default=10.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format=f"%(levelname)-8s: - %(message)s")
+
+    if args.benchmark == "candidates":
+        candidates_benchmark(args.case, args.formulation, args.repeats)
+    elif args.benchmark == "agents":
+        agents_benchmark(args.case, args.formulation, args.max_agents, args.time_limit)
+    else:
+        logging.error("The benchmark does not exist")
+        raise SystemExit(1)
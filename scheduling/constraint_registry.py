@@ -0,0 +1,72 @@
+"""
+    ConstraintRegistry class records the constraints of the model which can be cancelled during rescheduling.
+"""
+import collections
+import logging
+
+
+class ConstraintRegistry:
+    """
+    Records the indices of created constraints grouped by key and deactivates them by clearing
+    them in place. Constraints are never removed from the model, so the indices of all constraints
+    (including intervals referenced by no overlap constraints) stay valid.
+
+    :param model: Model containing the constraints.
+    :type model: CpModel
+    """
+    def __init__(self, model):
+        self.model = model
+        self.constraints = collections.defaultdict(list)
+
+    def add(self, key, constraint):
+        """
+        Records the constraint under the key.
+
+        :param key: Key of the group of constraints, e.g. ('border', task index).
+        :type key: tuple
+        :param constraint: Created constraint.
+        :type constraint: Constraint
+        :return: Recorded constraint.
+        :rtype: Constraint
+        """
+        self.constraints[key].append(constraint.Index())
+        return constraint
+
+    def deactivate(self, key):
+        """
+        Deactivates all constraints recorded under the key.
+
+        :param key: Key of the group of constraints.
+        :type key: tuple
+        :return: Number of deactivated constraints.
+        :rtype: int
+        """
+        indices = self.constraints.pop(key, [])
+        for idx in indices:
+            self.model.Proto().constraints[idx].Clear()
+        if indices:
+            logging.debug(f'{len(indices)} constraints have been deleted, {key}')
+        return len(indices)
+
+    def copy(self, model):
+        """
+        Returns the registry of the copy of the model, the constraints have the same indices in the copy.
+
+        :param model: Copy of the model.
+        :type model: CpModel
+        :rtype: ConstraintRegistry
+        """
+        registry = ConstraintRegistry(model)
+        for key, indices in self.constraints.items():
+            registry.constraints[key] = list(indices)
+        return registry
+
+    def is_active(self, key):
+        """
+        Checks whether any constraint is recorded under the key.
+
+        :param key: Key of the group of constraints.
+        :type key: tuple
+        :rtype: bool
+        """
+        return key in self.constraints
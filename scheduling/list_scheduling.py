@@ -0,0 +1,161 @@
+"""
+    ListSchedule class schedules the job greedily without solver. It is used as a fallback when
+    the solver does not find a solution and as a hint for the solver.
+"""
+from scheduling.preprocessing import get_agents, get_earliest_start, get_predecessors
+import collections
+import heapq
+
+
+class ListSchedule:
+    """
+    Greedy list scheduling of the job. Tasks are taken in the order in which their conditions are met and
+    each one is appended to the agent with the earliest finish. The schedule meets the precedence constraints
+    including the overlap offsets of the scheduling model, so it is a feasible solution of the model.
+
+    :param job: Job for which schedule is to be generated.
+    :type job: Job
+    :param task_duration: Durations of tasks for each agent, [total, preparation, execution, completion].
+    :type task_duration: dict
+    """
+    def __init__(self, job, task_duration=None):
+        self.job = job
+        if task_duration is None:
+            task_duration = self.job.get_duration_table().as_dict()
+        self.task_duration = task_duration
+
+    def get_solution(self, current_time=0, fixed_agents=None, committed=None):
+        """
+        Schedules tasks which have not started yet after the current time. Started tasks keep their agents and times.
+
+        :param current_time: Current time.
+        :type current_time: int
+        :param fixed_agents: True for each universal task which has to keep its current agent.
+        :type fixed_agents: list
+        :param committed: Start, end and agent of the tasks which keep them, by task index.
+        :type committed: dict
+        :return: Starts, ends, durations and agents (indices into job.agents) of all tasks.
+        :rtype: dict
+        """
+        tasks = self.job.task_sequence
+        predecessors = get_predecessors(tasks)
+        successors = [[] for _ in tasks]
+        remaining = [len(task_predecessors) for task_predecessors in predecessors]
+        for j, task_predecessors in enumerate(predecessors):
+            for i in task_predecessors:
+                successors[i].append(j)
+
+        start = [0] * len(tasks)
+        end = [0] * len(tasks)
+        agents = [None] * len(tasks)
+        agent_free = {agent: int(current_time) for agent in self.job.agents}
+        for i, task in enumerate(tasks):
+            if task.status in [1, 2]:
+                agents[i] = task.agent
+                start[i] = int(task.start)
+                if task.status == 2:
+                    end[i] = int(task.finish[0])
+                else:
+                    end[i] = max(start[i] + self.task_duration[task.agent][i][0], int(current_time))
+                agent_free[task.agent] = max(agent_free[task.agent], end[i])
+        for i, (task_start, task_end, agent) in (committed or {}).items():
+            agents[i], start[i], end[i] = agent, task_start, task_end
+            agent_free[agent] = max(agent_free[agent], task_end)
+
+        # Ready tasks are ordered by the end of their last predecessor
+        ready = [(0, j) for j, count in enumerate(remaining) if count == 0]
+        heapq.heapify(ready)
+        scheduled = 0
+        while ready:
+            _, j = heapq.heappop(ready)
+            scheduled += 1
+            if agents[j] is None:
+                if fixed_agents and fixed_agents[j]:
+                    candidates = [tasks[j].agent]
+                else:
+                    candidates = get_agents(tasks[j], self.job.agents)
+                best = None
+                for agent in candidates:
+                    duration = self.task_duration[agent][j][0]
+                    earliest_start = agent_free[agent]
+                    for i in predecessors[j]:
+                        earliest_start = max(earliest_start, get_earliest_start(i, agents[i], j, agent, end[i],
+                                                                                duration, self.task_duration))
+                    if best is None or earliest_start + duration < best[1] + best[2]:
+                        best = (agent, earliest_start, duration)
+                agents[j], start[j] = best[0], best[1]
+                end[j] = best[1] + best[2]
+                agent_free[agents[j]] = end[j]
+
+            for k in successors[j]:
+                remaining[k] -= 1
+                if remaining[k] == 0:
+                    heapq.heappush(ready, (max(end[i] for i in predecessors[k]), k))
+
+        if scheduled != len(tasks):
+            raise ValueError('Task conditions contain a cycle')
+        return {"Start": start, "End": end,
+                "Duration": [end[j] - start[j] for j in range(len(tasks))],
+                "Agent": [self.job.agents.index(agent) for agent in agents]}
+
+    def solve(self, current_time=0, fixed_agents=None):
+        """
+        Finds greedy schedule and parsers it.
+
+        :param current_time: Current time.
+        :type current_time: int
+        :param fixed_agents: True for each universal task which has to keep its current agent.
+        :type fixed_agents: list
+        :return: Schedula as sequence of tasks for each agent
+        :rtype agent: dictionary
+        """
+        return schedule_from_solution(self.job, self.task_duration, self.get_solution(current_time, fixed_agents))
+
+
+def schedule_from_solution(job, task_duration, solution):
+    """
+    Updates the tasks according to the solution and sorts them for each agent.
+
+    :param job: Scheduled job.
+    :type job: Job
+    :param task_duration: Durations of tasks for each agent, [total, preparation, execution, completion].
+    :type task_duration: dict
+    :param solution: Starts, ends and agents (indices into job.agents) of all tasks.
+    :type solution: dict
+    :return: Schedula as sequence of tasks for each agent
+    :rtype agent: dictionary
+    """
+    assigned_jobs = collections.defaultdict(list)
+    # Named tuple to manipulate solution information.
+    assigned_task_info = collections.namedtuple('assigned_task_info',
+                                                'start end task_id agent')
+    output = {}
+
+    # Create one list of assigned tasks per machine.
+    for i, task in enumerate(job.task_sequence):
+        agent = job.agents[solution["Agent"][i]]
+        assigned_jobs[agent].append(
+            assigned_task_info(start=solution["Start"][i],
+                               end=solution["End"][i],
+                               task_id=i,
+                               agent=agent))
+
+    for agent in job.agents:
+        # Sort by starting time.
+        assigned_jobs[agent].sort()
+        output[agent] = []
+        for assigned_task in assigned_jobs[agent]:
+            start = assigned_task.start
+            end = assigned_task.end
+
+            task = job.task_sequence[assigned_task.task_id]
+            job.task_sequence[assigned_task.task_id].agent = agent
+            if (task.status == -1) or (task.status == 0) or (task.status is None):
+                job.task_sequence[assigned_task.task_id].start = start
+                job.task_sequence[assigned_task.task_id].finish = end
+            elif task.status == 1:
+                job.task_sequence[assigned_task.task_id].finish = \
+                    task.start + task_duration[task.agent][task.id][0]
+
+            output[agent].append(job.task_sequence[assigned_task.task_id])
+    return output
@@ -0,0 +1,130 @@
+"""
+    Preprocessing of the scheduling model: topological order of the tasks
+    and time bounds of the tasks derived from the condition graph.
+"""
+from simulation.sim import get_agent_kind
+import collections
+
+
+def get_agents(task, agents):
+    """
+    Returns the agents which can execute the task. A task of one kind of agents, e.g. Robot,
+    can be executed by any agent of this kind until it is allocated to one of them.
+
+    :param task: Task
+    :type task: Task
+    :param agents: Names of all agents.
+    :type agents: list
+    :rtype: list
+    """
+    if task.universal:
+        return list(agents)
+    if task.agent in agents:
+        return [task.agent]
+    return [agent for agent in agents if get_agent_kind(agent) == task.agent]
+
+
+def get_overlap_offset(task_duration, i, j, agent, coworker):
+    """
+    Returns the minimal offset between the end of task i and the end of the dependent task j
+    when task i is executed by the agent and task j by the coworker.
+
+    :param task_duration: Durations of tasks for each agent, [total, preparation, execution, completion].
+    :type task_duration: dict
+    :param i: Index of the task.
+    :type i: int
+    :param j: Index of the dependent task.
+    :type j: int
+    :param agent: Agent of task i.
+    :type agent: str
+    :param coworker: Agent of task j.
+    :type coworker: str
+    :rtype: int
+    """
+    offset = task_duration[agent][i][1] + task_duration[agent][i][2] - task_duration[coworker][j][1]
+    return max(offset, 0)
+
+
+def get_predecessors(tasks):
+    """
+    Returns indices of the tasks each task depends on.
+
+    :param tasks: Sequence of tasks.
+    :type tasks: list
+    :rtype: list
+    """
+    task_idx = {task.id: i for i, task in enumerate(tasks)}
+    return [[task_idx[task_id] for task_id in task.conditions] for task in tasks]
+
+
+def topological_order(tasks):
+    """
+    Returns indices of the tasks ordered so that each task follows all tasks it depends on.
+
+    :param tasks: Sequence of tasks.
+    :type tasks: list
+    :rtype: list
+    """
+    predecessors = get_predecessors(tasks)
+    successors = [[] for _ in tasks]
+    remaining = [len(task_predecessors) for task_predecessors in predecessors]
+    for j, task_predecessors in enumerate(predecessors):
+        for i in task_predecessors:
+            successors[i].append(j)
+
+    ready = collections.deque(j for j, count in enumerate(remaining) if count == 0)
+    order = []
+    while ready:
+        i = ready.popleft()
+        order.append(i)
+        for j in successors[i]:
+            remaining[j] -= 1
+            if remaining[j] == 0:
+                ready.append(j)
+    if len(order) != len(tasks):
+        raise ValueError('Task conditions contain a cycle')
+    return order
+
+
+def get_earliest_start(i, agent, j, coworker, end_i, duration_j, task_duration):
+    """
+    Returns the earliest start of task j executed by the coworker after task i executed by the agent.
+    """
+    if agent == coworker:
+        return end_i
+    return end_i + get_overlap_offset(task_duration, i, j, agent, coworker) - duration_j
+
+
+def time_bounds(tasks, task_duration, horizon):
+    """
+    Computes the earliest start and the latest finish of each task by the longest paths in the condition graph.
+    The bounds hold for any combination of agents and any schedule finished before the horizon.
+
+    :param tasks: Sequence of tasks.
+    :type tasks: list
+    :param task_duration: Durations of tasks for each agent, [total, preparation, execution, completion].
+    :type task_duration: dict
+    :param horizon: Upper bound of the makespan.
+    :type horizon: int
+    :return: Earliest starts and latest finishes.
+    :rtype: tuple
+    """
+    agents = list(task_duration)
+    predecessors = get_predecessors(tasks)
+    order = topological_order(tasks)
+    earliest_start = [0] * len(tasks)
+    for j in order:
+        for i in predecessors[j]:
+            bound = min(get_earliest_start(i, agent, j, coworker, earliest_start[i] + task_duration[agent][i][0],
+                                           task_duration[coworker][j][0], task_duration)
+                        for agent in get_agents(tasks[i], agents) for coworker in get_agents(tasks[j], agents))
+            earliest_start[j] = max(earliest_start[j], bound)
+
+    latest_finish = [horizon] * len(tasks)
+    for j in reversed(order):
+        for i in predecessors[j]:
+            bound = max(latest_finish[j] - task_duration[coworker][j][0] if agent == coworker else
+                        latest_finish[j] - get_overlap_offset(task_duration, i, j, agent, coworker)
+                        for agent in get_agents(tasks[i], agents) for coworker in get_agents(tasks[j], agents))
+            latest_finish[i] = min(latest_finish[i], bound)
+    return earliest_start, latest_finish
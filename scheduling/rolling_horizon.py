@@ -0,0 +1,341 @@
+"""
+    RollingHorizonSchedule class schedules long jobs window by window with the CP-SAT model of the Schedule.
+"""
+from scheduling.scheduling_split_tasks import Schedule, print_schedule, rejection_penalty
+from scheduling.list_scheduling import ListSchedule
+from scheduling.preprocessing import get_predecessors, topological_order
+import numpy as np
+import logging
+import time
+import copy
+
+
+class RollingHorizonSchedule(Schedule):
+    """
+    Splits the tasks in topological order into overlapping windows. Each window is solved by the CP-SAT model
+    with the tasks committed by the previous windows frozen, only the tasks before the overlap are committed.
+    During the execution only the active window is rescheduled, the remaining tasks are appended greedily.
+
+    :param job: Job for which schedule is to be generated.
+    :type job: Job
+    :param window: Number of tasks solved together.
+    :type window: int
+    :param overlap: Number of tasks at the end of the window which are solved again with the next window.
+    :type overlap: int
+    :param schedule_param: Parameters of the Schedule of each window, e.g. formulation or time_limit.
+    :type schedule_param: dict
+    """
+    def __init__(self, job, window=16, overlap=4, **schedule_param):
+        if window < 1 or not 0 <= overlap < window:
+            raise ValueError(f'Invalid window {window} with overlap {overlap}')
+        super().__init__(job, **schedule_param)
+        self.window = window
+        self.overlap = overlap
+        schedule_param.pop('cache', None)
+        self.schedule_param = schedule_param
+        self.order = []
+        self.rank = {}
+        self.windows = 0
+        self.objective = None
+
+    def set_schedule(self, on_solution=None):
+        """
+        Solves all windows one after another.
+
+        :param on_solution: Function called with the solution of the whole job.
+        :type on_solution: function
+        :return: Schedula as sequence of tasks for each agent
+        :rtype agent: dictionary
+        """
+        self.set_duration_of_all_tasks()
+        # Ends of the greedy schedule order the tasks so that each window contains tasks executed at similar times
+        self.rank = {i: position for position, i in enumerate(topological_order(self.job.task_sequence))}
+        greedy = ListSchedule(self.job, self.task_duration).get_solution()
+        self.order = sorted(self.rank, key=lambda i: (greedy["End"][i], self.rank[i]))
+        self.solution_hint = self.plan(all_windows=True)
+        if on_solution:
+            on_solution(dict(self.solution_hint, Objective=self.objective,
+                             **{"Wall time": self.rescheduling_run_time[-1][2]}))
+        schedule = self.parse_solution(self.solution_hint)
+        print_schedule(schedule)
+        self.print_info()
+        return schedule
+
+    def start_anytime_schedule(self):
+        """
+        Windows are solved one after another, so the first schedule is already the final one.
+
+        :return: Schedula as sequence of tasks for each agent
+        :rtype agent: dictionary
+        """
+        return self.set_schedule()
+
+    def refresh_variables(self, current_time):
+        """
+        Saves the current time, the tasks which have not started yet are rescheduled after it.
+        """
+        self.current_time = current_time
+
+    def solve(self, on_solution=None):
+        """
+        Reschedules the active window.
+
+        :return: Schedula as sequence of tasks for each agent
+        :rtype agent: dictionary
+        """
+        self.solution_hint = self.plan()
+        return self.parse_solution(self.solution_hint)
+
+    def set_new_agent(self, task):
+        """
+        The new agent of the task is kept by the next rescheduling, nothing has to be changed in the model.
+        """
+        logging.debug(f'Task {task.id} is given to {task.agent}')
+
+    def fix_agents_var(self):
+        """
+        Agents of universal tasks are kept once they have been scheduled.
+        """
+
+    def set_list_of_possible_changes(self, available_tasks, agent):
+        """
+        Evaluates the objective of the schedule for each available task given to the agent
+        by rescheduling the active window.
+
+        :param available_tasks: Tasks which the agent can take over.
+        :type available_tasks: list
+        :param agent: Agent taking over the task.
+        :type agent: Agent
+        :return: Sorted list of objective values and tasks, None if no change is feasible.
+        :rtype: list
+        """
+        candidates = [task for task in available_tasks if task.id not in agent.rejection_tasks]
+        if len(candidates) == 0:
+            return None
+
+        time_limit = self.evaluation_time_budget / len(candidates)
+        makespans = []
+        for available_task in candidates:
+            current_agent = available_task.agent
+            available_task.agent = agent.name
+            start = time.perf_counter()
+            try:
+                self.plan(time_limit=time_limit, record=False)
+            finally:
+                available_task.agent = current_agent
+            makespans.append([self.objective, available_task])
+            self.evaluation_run_time.append(time.perf_counter() - start)
+
+        makespans.sort(key=lambda x: x[0])
+        return makespans
+
+    def plan(self, all_windows=False, time_limit=None, record=True):
+        """
+        Schedules the tasks which have not started yet. Either all windows are solved, or only the active
+        window is solved and the remaining tasks are appended by the list scheduling.
+
+        :param all_windows: Solve all windows.
+        :type all_windows: bool
+        :param time_limit: Time limit of each window in seconds, defaults to the time limit of the schedule.
+        :type time_limit: float
+        :param record: Append the run to rescheduling_run_time.
+        :type record: bool
+        :return: Starts, ends, durations and agents (indices into job.agents) of all tasks.
+        :rtype: dict
+        """
+        start_time = time.perf_counter()
+        committed = {}
+        for i, task in enumerate(self.job.task_sequence):
+            if task.status == 2:
+                committed[i] = (int(task.start), int(task.finish[0]), task.agent)
+            elif task.status == 1:
+                committed[i] = (int(task.start), max(int(task.start) + self.task_duration[task.agent][i][0],
+                                                     int(self.current_time)), task.agent)
+        pending = [i for i in self.order if i not in committed]
+
+        windows = 0
+        while pending:
+            window = pending[:self.window]
+            result = self.solve_window(window, committed, time_limit)
+            windows += 1
+            if all_windows and len(pending) > self.window:
+                # Tasks which end first are committed, a task never ends before the tasks it depends on
+                window = sorted(window, key=lambda i: (result[i][1], self.rank[i]))[:self.window - self.overlap]
+            committed.update({i: result[i] for i in window})
+            if not all_windows:
+                break
+            pending = [i for i in pending if i not in committed]
+
+        fixed_agents = [task.universal and task.agent in self.job.agents for task in self.job.task_sequence]
+        solution = ListSchedule(self.job, self.task_duration).get_solution(self.current_time, fixed_agents,
+                                                                           committed)
+        self.objective = max(solution["End"], default=0) + rejection_penalty(self.job, solution)
+        if record:
+            self.windows = windows
+            self.horizon = max(solution["End"], default=0)
+            self.rescheduling_run_time.append(['ROLLING', self.objective, time.perf_counter() - start_time,
+                                               False, None])
+        return solution
+
+    def solve_window(self, window, committed, time_limit=None):
+        """
+        Solves the window by the CP-SAT model. Committed tasks which may overlap with the window
+        or which the window depends on are frozen in the model.
+
+        :param window: Indices of the tasks of the window.
+        :type window: list
+        :param committed: Start, end and agent of committed tasks by task index.
+        :type committed: dict
+        :param time_limit: Time limit in seconds.
+        :type time_limit: float
+        :return: Start, end and agent of the tasks of the window by task index.
+        :rtype: dict
+        """
+        tasks = self.job.task_sequence
+        predecessors = get_predecessors(tasks)
+        required = {i for j in window for i in predecessors[j]}
+        # Tasks of the window are appended after the committed tasks of the less busy agent
+        agent_free = {agent: 0 for agent in self.job.agents}
+        for _, end, agent in committed.values():
+            agent_free[agent] = max(agent_free[agent], end)
+        release = max(int(self.current_time), min(agent_free.values()))
+        frozen = [i for i, (_, end, _) in committed.items() if end > release or i in required]
+        sub_idx = {i: idx for idx, i in enumerate(frozen + window)}
+
+        sub_tasks = []
+        sub_duration = {agent: [] for agent in self.job.agents}
+        for i in frozen + window:
+            task = tasks[i]
+            sub_task = WindowTask(task, sub_idx[i], [sub_idx[c] for c in predecessors[i] if c in sub_idx])
+            if i in committed:
+                task_start, task_end, agent = committed[i]
+                sub_task.universal, sub_task.agent, sub_task.status = False, agent, 2
+                sub_task.start = task_start
+                sub_task.finish = [task_end] + self.task_duration[agent][i][1:]
+                for duration_agent in self.job.agents:
+                    sub_duration[duration_agent].append([task_end - task_start] + self.task_duration[agent][i][1:])
+            else:
+                if task.universal and task.agent in self.job.agents:
+                    sub_task.universal, sub_task.agent = False, task.agent
+                for agent in self.job.agents:
+                    sub_duration[agent].append(self.task_duration[agent][i])
+            sub_tasks.append(sub_task)
+
+        sub_job = copy.copy(self.job)
+        sub_job.task_sequence = sub_tasks
+        sub_job.task_number = len(sub_tasks)
+        sub_job.duration_tables = {}
+        schedule_param = dict(self.schedule_param, evaluation_workers=1)
+        if time_limit is not None:
+            schedule_param['time_limit'] = time_limit
+        window_model = WindowSchedule(sub_job, sub_duration, release, **schedule_param)
+        window_model.set_variables()
+        window_model.set_constraints()
+        if not (window_model.run_solver() or window_model.run_greedy()):
+            raise RuntimeError(f'Window of tasks {window} cannot be scheduled')
+        self.solver, self.status = window_model.solver, window_model.status
+
+        solution = window_model.solution_hint
+        return {i: (solution["Start"][sub_idx[i]], solution["End"][sub_idx[i]],
+                    self.job.agents[solution["Agent"][sub_idx[i]]]) for i in window}
+
+    def print_info(self):
+        """
+        Prints basic info about solution and solving process.
+        """
+        logging.info(f'Rolling horizon: {self.windows} windows of {self.window} tasks, overlap {self.overlap}')
+        logging.info(f'Objective value: {self.objective}')
+        logging.info(f'  - wall time : {self.rescheduling_run_time[-1][2]:f} s')
+
+
+class WindowTask:
+    """
+    Copy of the task in the window with the index in the window.
+
+    :param task: Original task.
+    :type task: Task
+    :param idx: Index of the task in the window.
+    :type idx: int
+    :param conditions: Indices of the tasks in the window the task depends on.
+    :type conditions: list
+    """
+    def __init__(self, task, idx, conditions):
+        self.id = idx
+        self.action = task.action
+        self.status = None
+        self.conditions = conditions
+        self.universal = task.universal
+        self.agent = task.agent
+        self.start = None
+        self.finish = None
+        self.origin = task
+
+    def get_reject_prob(self):
+        """
+        Returns the probability of rejection of the original task.
+        """
+        return self.origin.get_reject_prob()
+
+
+class WindowSchedule(Schedule):
+    """
+    Schedule of one window. Durations are given, frozen tasks have status 2 and keep their times,
+    the other tasks start after the release time.
+
+    :param job: Tasks of the window and frozen tasks.
+    :type job: Job
+    :param task_duration: Durations of tasks for each agent, [total, preparation, execution, completion].
+    :type task_duration: dict
+    :param release: Time after which the tasks of the window start.
+    :type release: int
+    """
+    def __init__(self, job, task_duration, release, **schedule_param):
+        super().__init__(job, **schedule_param)
+        self.window_duration = task_duration
+        self.release = release
+        self.current_time = release
+
+    def set_duration_of_all_tasks(self):
+        """
+        Sets the given durations.
+        """
+        self.set_duration_matrix(np.stack([np.array(self.window_duration[agent], dtype=int)
+                                           for agent in self.job.agents], axis=1))
+
+    def set_max_horizon(self):
+        """
+        Extends the horizon by the release time and the ends of frozen tasks.
+        """
+        super().set_max_horizon()
+        self.horizon += max([self.release] + [task.finish[0] for task in self.job.task_sequence if task.status == 2])
+
+    def set_time_bounds(self):
+        """
+        Tasks of the window do not start before the release time.
+        """
+        super().set_time_bounds()
+        for i, task in enumerate(self.job.task_sequence):
+            if task.status != 2:
+                self.earliest_start[i] = max(self.earliest_start[i], self.release)
+
+    def set_objective(self):
+        """
+        Sets the objective over the tasks of the window, the ends of frozen tasks are constant.
+        """
+        window = [i for i, task in enumerate(self.job.task_sequence) if task.status != 2]
+        obj_var = self.model.NewIntVar(0, self.horizon, 'makespan')
+        self.model.AddMaxEquality(obj_var, [self.end_var[i] for i in window])
+        obj_var1 = self.model.NewIntVar(0, self.horizon, 'soft_constrains')
+        self.model.AddMaxEquality(obj_var1, [self.soft_constr[i] for i in window])
+        self.model.Minimize(obj_var + obj_var1)
+
+    def set_constraints(self):
+        """
+        Sets constraints for schedule and freezes the committed tasks.
+        """
+        if self.constraints_set:
+            return
+        super().set_constraints()
+        for i, task in enumerate(self.job.task_sequence):
+            if task.status == 2:
+                self.model.Add(self.start_var[i] == int(task.start))
@@ -0,0 +1,177 @@
+"""
+    ScheduleCache class stores the solutions of scheduling models, so an unchanged job is not solved again.
+"""
+import collections
+import hashlib
+import logging
+import json
+import os
+
+# The cache is shared by all runs regardless of their working directory
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.schedule_cache')
+
+
+def fingerprint(tasks, task_duration, seed, solver_param):
+    """
+    Returns the hash of everything the solution of the model depends on.
+
+    :param tasks: Sequence of tasks.
+    :type tasks: list
+    :param task_duration: Durations of tasks for each agent, [total, preparation, execution, completion].
+    :type task_duration: dict
+    :param seed: Seed of the simulation.
+    :type seed: int
+    :param solver_param: Formulation and parameters of the solver.
+    :type solver_param: dict
+    :return: Hexadecimal digest.
+    :rtype: str
+    """
+    description = {
+        'Tasks': [[task.id, task.agent, task.universal, task.conditions, task.action, task.status,
+                   task.start, task.finish, task.get_reject_prob() if task.universal else None]
+                  for task in tasks],
+        'Duration': {agent: [[int(value) for value in duration] for duration in durations]
+                     for agent, durations in task_duration.items()},
+        'Seed': seed,
+        'Solver': solver_param}
+    canonical = json.dumps(description, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ScheduleCache:
+    """
+    Two-tier cache of solutions: the least recently used entries are dropped from memory,
+    the files of the least recently used entries are deleted when the directory exceeds its size.
+
+    :param capacity: Maximal number of solutions kept in memory.
+    :type capacity: int
+    :param directory: Directory of the on-disk tier, None to keep solutions only in memory.
+    :type directory: str
+    :param max_size: Maximal size of the on-disk tier in bytes.
+    :type max_size: int
+    """
+    def __init__(self, capacity=128, directory=CACHE_DIRECTORY, max_size=16 * 1024 * 1024):
+        self.capacity = capacity
+        self.directory = directory
+        self.max_size = max_size
+        self.memory = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def get(self, key):
+        """
+        Returns the solution stored under the key.
+
+        :param key: Fingerprint of the model.
+        :type key: str
+        :return: Solution, None if it is not cached.
+        :rtype: dict
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return self.memory[key]
+
+        solution = self.load(key)
+        if solution is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.remember(key, solution)
+        return solution
+
+    def put(self, key, solution):
+        """
+        Stores the solution under the key in both tiers.
+
+        :param key: Fingerprint of the model.
+        :type key: str
+        :param solution: Solution, see Schedule.get_solution_values.
+        :type solution: dict
+        """
+        self.remember(key, solution)
+        if self.directory is None:
+            return
+        path = self.get_path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(solution, f)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def remember(self, key, solution):
+        """
+        Stores the solution in memory and drops the least recently used one if the capacity is exceeded.
+        """
+        self.memory[key] = solution
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def load(self, key):
+        """
+        Loads the solution from the disk, the access time of the file is updated for the eviction.
+
+        :param key: Fingerprint of the model.
+        :type key: str
+        :return: Solution, None if the file does not exist or cannot be read.
+        :rtype: dict
+        """
+        if self.directory is None:
+            return None
+        path = self.get_path(key)
+        try:
+            with open(path) as f:
+                solution = json.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as error:
+            logging.warning(f'Cached schedule {path} cannot be read: {error}')
+            return None
+        return solution
+
+    def evict(self):
+        """
+        Deletes the least recently used files until the on-disk tier fits its size.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(entry[1] for entry in entries)
+        for _, file_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= file_size
+            logging.debug(f'Cached schedule {path} has been evicted')
+
+    def get_path(self, key):
+        """
+        Returns the path of the file of the key.
+        """
+        return os.path.join(self.directory, f'{key}.json')
+
+    def clear(self):
+        """
+        Deletes all cached solutions.
+        """
+        self.memory.clear()
+        if self.directory is None:
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.directory, name))
@@ -4,25 +4,92 @@ This class create model and solve scheduling problem.
 @author: Marina Ionova, student of Cybernetics and Robotics at the CTU in Prague
 @contact: marina.ionova@cvut.cz
 """
-from simulation.sim import set_task_time
+from scheduling.constraint_registry import ConstraintRegistry
+from scheduling.list_scheduling import ListSchedule, schedule_from_solution
+from scheduling.schedule_cache import fingerprint
+from scheduling.preprocessing import get_agents, get_overlap_offset, time_bounds
+from simulation.sim import get_agent_kind
 from ortools.sat.python import cp_model
+from concurrent.futures import ProcessPoolExecutor, wait
+import numpy as np
+import ortools
 import collections
+import threading
+import time
 import logging
-import copy
+import queue
+import math
+import os
 
 LAMBDA = 1
+SOLVER_SEED = 73
+
+# Model formulations
+PAIRWISE = 'pairwise'
+NO_OVERLAP = 'no_overlap'
 
 
 class Schedule:
     """
-    A class for generating and managing schedules for a given job.
+    A class for generating and managing schedules for a given job. Each task is allocated to one of the agents
+    of the job, the allocation is encoded by one literal for each agent which can execute the task.
 
     :param job: Job for which schedule is to be generated.
     :type job: Job
+    :param formulation: Model formulation, PAIRWISE (reified constraints for every task pair)
+                        or NO_OVERLAP (optional intervals per agent).
+    :type formulation: str
+    :param warm_start: Use the last feasible solution as hint for rescheduling, the greedy schedule
+                       is the hint of the first solve.
+    :type warm_start: bool
+    :param compare_cold_solve: Solve the model also without hints to measure the speed-up of rescheduling.
+    :type compare_cold_solve: bool
+    :param evaluation_workers: Number of processes evaluating possible changes, defaults to number of CPUs.
+                               The solver of each process uses its share of the CPUs.
+    :type evaluation_workers: int
+    :param evaluation_time_budget: Total time in seconds for the evaluation of possible changes.
+    :type evaluation_time_budget: float
+    :param time_limit: Wall-clock budget of one solve in seconds.
+    :type time_limit: float
+    :param relative_gap: The search stops when the relative gap to the best bound is below this limit.
+    :type relative_gap: float
+    :param tighten_bounds: Restrict the domains of start and end variables by the condition graph
+                           and the horizon of the greedy schedule.
+    :type tighten_bounds: bool
+    :param cache: Cache of solutions, the initial schedule of an unchanged job is not solved again. The anytime
+                  search caches its final solution only if it has not been stopped by finish_anytime_schedule.
+    :type cache: ScheduleCache
+    :param solver_workers: Number of search workers of the solver, defaults to the solver default.
+    :type solver_workers: int
     """
-    def __init__(self, job):
+    def __init__(self, job, formulation=PAIRWISE, warm_start=True, compare_cold_solve=False,
+                 evaluation_workers=None, evaluation_time_budget=10.0, time_limit=10.0, relative_gap=0.0,
+                 tighten_bounds=True, cache=None, solver_workers=None):
+        if formulation not in (PAIRWISE, NO_OVERLAP):
+            raise ValueError(f'Unknown model formulation: {formulation}')
         self.COUNTER = 0
         self.job = job
+        self.formulation = formulation
+        self.warm_start = warm_start
+        self.compare_cold_solve = compare_cold_solve
+        self.solution_hint = None
+        self.current_time = 0
+        self.evaluation_workers = evaluation_workers or os.cpu_count() or 1
+        self.evaluation_time_budget = evaluation_time_budget
+        self.evaluation_pool = None
+        self.time_limit = time_limit
+        self.relative_gap = relative_gap
+        self.tighten_bounds = tighten_bounds
+        self.cache = cache
+        # Key under which the anytime search caches its final solution, None if it must not be cached
+        self.anytime_cache_key = None
+        self.solver_workers = solver_workers
+        self.constraints_set = False
+        self.earliest_start = [0] * self.job.task_number
+        self.latest_finish = [0] * self.job.task_number
+        self.solution_streamer = None
+        self.solution_queue = None
+        self.solving_thread = None
         self.model = cp_model.CpModel()
         self.solver = 0
         self.status = None
@@ -31,14 +98,17 @@ class Schedule:
         self.horizon = 0
         self.duration = [0] * self.job.task_number
         self.model_agent = [0] * self.job.task_number
-        self.human_task_bool = [True] * self.job.task_number
-        self.task_duration = {"Human": [], "Robot": []}
+        self.agent_bool = [{} for _ in range(self.job.task_number)]
+        self.duration_matrix = np.zeros((self.job.task_number, len(self.job.agents), 4), dtype=int)
+        self.allowed_agents = np.zeros((self.job.task_number, len(self.job.agents)), dtype=bool)
+        self.task_duration = {agent: [] for agent in self.job.agents}
         self.start_var = [0] * self.job.task_number
         self.end_var = [0] * self.job.task_number
         self.tasks_with_final_var = []
-        self.duration_constraints = [[0, 0] for i in range(self.job.task_number)]
         self.fix_agent = [0] * self.job.task_number
-        self.border_constraints = [[[0, 0, 0, 0]] * self.job.task_number] * self.job.task_number
+        self.keep_agent = [None] * self.job.task_number
+        self.constraints = ConstraintRegistry(self.model)
+        self.agent_intervals = {agent: [] for agent in self.job.agents}
 
         self.rescheduling_run_time = []
         self.evaluation_run_time = []
@@ -49,62 +119,90 @@ class Schedule:
         Sets constraints for schedule
         """
         self.set_max_horizon()
+        self.set_time_bounds()
         # Named tuple to store information about created variables.
         task_info = collections.namedtuple('task_info', 'start end agent interval')
+        min_durations = np.where(self.allowed_agents, self.duration_matrix[:, :, 0],
+                                 np.iinfo(self.duration_matrix.dtype).max).min(axis=1)
 
         for i, task in enumerate(self.job.task_sequence):
-            self.human_task_bool[i] = self.model.NewBoolVar(f"task_{task.id}_4_human")
-            self.task_duration["Human"].append(set_task_time(task, 'Human'))
-            self.task_duration["Robot"].append(set_task_time(task, 'Robot'))
             suffix = f'_{task.id}'
+            self.agent_bool[i] = {a: self.model.NewBoolVar(f"task_{task.id}_4_agent_{a}")
+                                  for a in np.flatnonzero(self.allowed_agents[i]).tolist()}
+            self.model.AddExactlyOne(list(self.agent_bool[i].values()))
 
             # condition for different agent
-            self.start_var[i] = self.model.NewIntVar(0, self.horizon, 'start' + suffix)
-            self.end_var[i] = self.model.NewIntVar(0, self.horizon, 'end' + suffix)
+            min_duration = int(min_durations[i])
+            self.start_var[i] = self.model.NewIntVar(self.earliest_start[i], self.latest_finish[i] - min_duration,
+                                                     'start' + suffix)
+            self.end_var[i] = self.model.NewIntVar(self.earliest_start[i] + min_duration, self.latest_finish[i],
+                                                   'end' + suffix)
 
             self.duration[i] = self.model.NewIntVarFromDomain(
-                cp_model.Domain.FromIntervals(
-                    [[self.task_duration["Human"][i][0]], [self.task_duration["Robot"][i][0]]]),
+                cp_model.Domain.FromValues([int(self.duration_matrix[i, a, 0]) for a in self.agent_bool[i]]),
                 'duration' + suffix)
 
-            if task.agent == "Human":
-                self.model.Add(self.human_task_bool[i] == True)
-            elif task.agent == "Robot":
-                self.model.Add(self.human_task_bool[i] == False)
-            else:
+            if task.universal:
                 prob = int(LAMBDA*task.get_reject_prob()*10)
+                human = [literal for a, literal in self.agent_bool[i].items()
+                         if get_agent_kind(self.job.agents[a]) == "Human"]
                 self.soft_constr[i] = self.model.NewIntVar(0, prob, 'rejection'+suffix)
-                self.model.Add(self.soft_constr[i] == prob).OnlyEnforceIf(self.human_task_bool[i])
-                self.model.Add(self.soft_constr[i] == 0).OnlyEnforceIf(self.human_task_bool[i].Not())
-
+                self.model.Add(self.soft_constr[i] == prob * sum(human))
 
             interval_var = self.model.NewIntervalVar(self.start_var[i], self.duration[i], self.end_var[i],
                                                      'interval' + suffix)
             self.all_tasks[task.id] = task_info(start=self.start_var[i],
                                                 end=self.end_var[i],
-                                                agent=self.human_task_bool[i],
+                                                agent=self.agent_bool[i],
                                                 interval=interval_var)
 
+            if self.formulation == NO_OVERLAP:
+                for a, literal in self.agent_bool[i].items():
+                    self.agent_intervals[self.job.agents[a]].append(self.model.NewOptionalIntervalVar(
+                        self.start_var[i], self.duration[i], self.end_var[i], literal, f'interval_{a}' + suffix))
+
     def set_constraints(self):
         """
-        Sets constraints for schedule
+        Sets constraints for schedule. The constraints of a schedule loaded from the cache are set
+        only when the model is needed for rescheduling.
         """
-        # Precedences inside a job.
+        if self.constraints_set:
+            return
+        self.constraints_set = True
         for i, task in enumerate(self.job.task_sequence):
-            self.duration_constraints[i][0] = self.model.Add(self.duration[i] == self.task_duration["Human"][i][0]) \
-                .OnlyEnforceIf(self.human_task_bool[i])
-            self.duration_constraints[i][1] = self.model.Add(self.duration[i] == self.task_duration["Robot"][i][0]) \
-                .OnlyEnforceIf(self.human_task_bool[i].Not())
+            for a, literal in self.agent_bool[i].items():
+                self.constraints.add(('duration', i), self.model.Add(
+                    self.duration[i] == int(self.duration_matrix[i, a, 0])).OnlyEnforceIf(literal))
 
             self.model.Add(self.all_tasks[task.id].end > self.all_tasks[task.id].start)
 
+        if self.formulation == NO_OVERLAP:
+            self.set_no_overlap_constraints()
+        else:
+            self.set_pairwise_constraints()
+        self.set_objective()
+
+    def set_objective(self):
+        """
+        Sets the objective, the makespan with the highest penalty of rejection of tasks given to human.
+        """
+        obj_var = self.model.NewIntVar(0, self.horizon, 'makespan')
+        self.model.AddMaxEquality(obj_var, [self.all_tasks[i].end for i, task in enumerate(self.all_tasks)])
+        obj_var1 = self.model.NewIntVar(0, self.horizon, 'soft_constrains')
+        self.model.AddMaxEquality(obj_var1, self.soft_constr)
+        self.model.Minimize(obj_var + obj_var1)
+
+    def set_pairwise_constraints(self):
+        """
+        Sets precedence and no overlap constraints with reified booleans for every pair of tasks.
+        """
+        # Precedences inside a job.
+        for i, task in enumerate(self.job.task_sequence):
             # Precedence constraints, which prevent dependent tasks for from overlapping in time.
             # No overlap constraints, which prevent tasks for the same agent from overlapping in time.
             for j in range(self.job.task_number):
                 if self.job.task_sequence[j].id != task.id:
-                    same_agent = self.model.NewBoolVar(f"same_agent_4_tasks_{task.id}_{j}")
-                    self.model.Add(self.human_task_bool[i] == self.human_task_bool[j]).OnlyEnforceIf(same_agent)
-                    self.model.Add(self.human_task_bool[i] != self.human_task_bool[j]).OnlyEnforceIf(same_agent.Not())
+                    same_agent = self.get_same_agent(i, j)
 
                     dependent_task_id = self.job.task_sequence[j].id
                     condition = self.model.NewBoolVar(f"{j}_depend_on_{i}")
@@ -116,48 +214,88 @@ class Schedule:
 
                     # If not conditions and same agents
                     after = self.model.NewBoolVar(f"{j}_after_{task.id}")
-                    self.border_constraints[i][j][0] = self.model.Add(self.all_tasks[j].start >= self.all_tasks[i].end). \
-                        OnlyEnforceIf([condition.Not(), same_agent, after])
-                    self.border_constraints[i][j][1] = self.model.Add(self.all_tasks[j].end <= self.all_tasks[i].start). \
-                        OnlyEnforceIf([condition.Not(), same_agent, after.Not()])
-
-                    # If conditions and same agents
-                    self.border_constraints[i][j][2] = self.model.Add(
-                        self.all_tasks[dependent_task_id].start >= self.all_tasks[task.id].end). \
-                        OnlyEnforceIf([condition, same_agent])
-
-                    # If conditions and not same agents
-                    k = self.model.NewIntVar(0, 1000, f'overlap_offset_{i}_{j}')
-                    k1 = self.task_duration["Human"][i][1] + self.task_duration["Human"][i][2] - \
-                         self.task_duration["Robot"][dependent_task_id][1]
-                    k2 = self.task_duration["Robot"][i][1] + self.task_duration["Robot"][i][2] - \
-                         self.task_duration["Human"][dependent_task_id][1]
-
-                    if k1 < 0:
-                        k1 = 0
-                    if k2 < 0:
-                        k2 = 0
-
-                    logging.debug(f'k1 = {k1}, k2 = {k2}')
-                    self.model.Add(k == k1).OnlyEnforceIf([self.human_task_bool[i], condition])
-                    self.model.Add(k == k2).OnlyEnforceIf([self.human_task_bool[i].Not(), condition])
-
-                    self.border_constraints[i][j][3] = self.model.Add(
-                        self.all_tasks[dependent_task_id].end >= self.all_tasks[task.id].end + k) \
-                        .OnlyEnforceIf([condition, same_agent.Not()])
-
-        # Makespan objective.
-        obj_var = self.model.NewIntVar(0, self.horizon, 'makespan')
-        self.model.AddMaxEquality(obj_var, [self.all_tasks[i].end for i, task in enumerate(self.all_tasks)])
-        obj_var1 = self.model.NewIntVar(0, self.horizon, 'soft_constrains')
-        self.model.AddMaxEquality(obj_var1, self.soft_constr)
-        self.model.Minimize(obj_var + obj_var1)
+                    self.constraints.add(('border', i), self.model.Add(
+                        self.all_tasks[j].start >= self.all_tasks[i].end).
+                        OnlyEnforceIf([condition.Not(), same_agent, after]))
+                    self.constraints.add(('border', i), self.model.Add(
+                        self.all_tasks[j].end <= self.all_tasks[i].start).
+                        OnlyEnforceIf([condition.Not(), same_agent, after.Not()]))
+
+                    # If conditions, the same agent starts the dependent task after the end of the task,
+                    # another agent ends it after the overlap offset
+                    if task.id in self.job.task_sequence[j].conditions:
+                        self.set_overlap_constraints(i, dependent_task_id, [condition])
+
+    def get_same_agent(self, i, j):
+        """
+        Creates a literal which is true if tasks i and j are allocated to the same agent.
+
+        :param i: Index of the task.
+        :type i: int
+        :param j: Index of the other task.
+        :type j: int
+        :rtype: IntVar
+        """
+        same_agent = self.model.NewBoolVar(f"same_agent_4_tasks_{self.job.task_sequence[i].id}_{j}")
+        both = []
+        for a in self.agent_bool[i].keys() & self.agent_bool[j].keys():
+            literal = self.model.NewBoolVar(f"tasks_{i}_{j}_4_agent_{a}")
+            self.model.AddBoolAnd([self.agent_bool[i][a], self.agent_bool[j][a]]).OnlyEnforceIf(literal)
+            self.model.AddBoolOr([self.agent_bool[i][a].Not(), self.agent_bool[j][a].Not()]) \
+                .OnlyEnforceIf(literal.Not())
+            both.append(literal)
+        self.model.Add(same_agent == sum(both))
+        return same_agent
+
+    def set_overlap_constraints(self, i, j, enforcement=()):
+        """
+        Sets the precedence of the dependent task j for each pair of agents of tasks i and j. The same agent
+        starts task j after the end of task i, another agent may overlap task i and ends task j after the offset.
+
+        :param i: Index of the task.
+        :type i: int
+        :param j: Index of the dependent task.
+        :type j: int
+        :param enforcement: Literals enforcing the constraints.
+        :type enforcement: list
+        """
+        for a, agent_literal in self.agent_bool[i].items():
+            for b, coworker_literal in self.agent_bool[j].items():
+                if a == b:
+                    constraint = self.model.Add(self.start_var[j] >= self.end_var[i])
+                else:
+                    offset = get_overlap_offset(self.task_duration, i, j, self.job.agents[a], self.job.agents[b])
+                    logging.debug(f'offset {self.job.agents[a]}, {self.job.agents[b]} = {offset}')
+                    constraint = self.model.Add(self.end_var[j] >= self.end_var[i] + offset)
+                self.constraints.add(('border', i), constraint.OnlyEnforceIf(
+                    list(enforcement) + [agent_literal, coworker_literal]))
+
+    def set_no_overlap_constraints(self):
+        """
+        Sets no overlap constraint over the optional intervals of each agent. Precedence constraints
+        are created only for the task conditions.
+        """
+        for agent in self.job.agents:
+            self.model.AddNoOverlap(self.agent_intervals[agent])
+
+        task_idx = {task.id: i for i, task in enumerate(self.job.task_sequence)}
+        for j, dependent_task in enumerate(self.job.task_sequence):
+            for task_id in dependent_task.conditions:
+                self.set_overlap_constraints(task_idx[task_id], j)
+
+        # Schedule the earliest tasks first, the first solution is found without backtracking
+        self.model.AddDecisionStrategy(self.start_var, cp_model.CHOOSE_LOWEST_MIN, cp_model.SELECT_MIN_VALUE)
 
     def refresh_variables(self, current_time):
         """
         Changes the variable domains according to what is happening to update the schedule.
         """
+        self.current_time = current_time
+        self.set_constraints()
         for i, task in enumerate(self.job.task_sequence):
+            if task.id not in self.tasks_with_final_var:
+                # Bounds of the initial schedule are not valid once the execution deviates from it
+                self.model.Proto().variables[self.end_var[i].Index()].domain[:] = [0, self.horizon]
             if (task.id not in self.tasks_with_final_var) and (task.status in [1, 2]):
                 if task.status == 2:
                     task_duration = int(task.finish[0]) - int(task.start)
@@ -179,16 +317,9 @@ class Schedule:
                         self.model.Proto().variables[self.duration[i].Index()].domain[:] = []
                         self.model.Proto().variables[self.duration[i].Index()].domain.extend(
                             cp_model.Domain(task_duration, task_duration).FlattenedIntervals())
-                if self.duration_constraints[i][0].Proto() in self.model.Proto().constraints:
-                    for j in range(2):
-                        self.model.Proto().constraints.remove(self.duration_constraints[i][j].Proto())
                 # Cancel constraints
-                for j in range(self.job.task_number):
-                    for k in range(4):
-                        if not isinstance(self.border_constraints[i][j][k], int) and \
-                                self.border_constraints[i][j][k].Proto() in self.model.Proto().constraints:
-                            logging.debug(f'Constraints has been deleted, Task{task.id}')
-                            self.model.Proto().constraints.remove(self.border_constraints[i][j][k].Proto())
+                self.constraints.deactivate(('duration', i))
+                self.constraints.deactivate(('border', i))
 
                 self.model.Proto().variables[self.start_var[i].Index()].domain[:] = []
                 self.model.Proto().variables[self.start_var[i].Index()].domain.extend(
@@ -200,80 +331,316 @@ class Schedule:
                 self.model.Proto().variables[self.start_var[i].Index()].domain.extend(
                     cp_model.Domain(int(current_time), self.horizon).FlattenedIntervals())
 
-    def solve(self):
+    def solve(self, on_solution=None):
         """
         Finds schedula and parsers it.
 
-        :return: Schedula as sequence of tasks for each agent
+        :param on_solution: Function called with each improving solution found during the search.
+        :type on_solution: function
+        :return: Schedula as sequence of tasks for each agent, None if the scheduling failed
         :rtype agent: dictionary
         """
-        self.assigned_jobs = collections.defaultdict(list)
-        # Creates the solver and solve.
-        self.solver = cp_model.CpSolver()
-        self.solver.parameters.random_seed = 73
-        self.solver.parameters.max_time_in_seconds = 10.0
-        self.status = self.solver.Solve(self.model)
+        if self.run_solver(on_solution) or self.run_greedy():
+            return self.parse_solution(self.solution_hint)
+        else:
+            logging.error(f"Scheduling failed, max self.horizon: {self.horizon} \n")
+            self.job.__str__()
+            return None
 
-        # Named tuple to manipulate solution information.
-        assigned_task_info = collections.namedtuple('assigned_task_info',
-                                                    'start end task_id agent')
+    def run_solver(self, on_solution=None):
+        """
+        Solves the model and saves the values of the found solution.
 
-        if self.status == cp_model.OPTIMAL or self.status == cp_model.FEASIBLE:
-            output = {}
+        :param on_solution: Function called with each improving solution found during the search.
+        :type on_solution: function
+        :return: True if a solution has been found.
+        :rtype: bool
+        """
+        self.set_constraints()
+        self.model.ClearAssumptions()
+        self.model.AddAssumptions(self.get_assumptions())
+        if self.warm_start and self.solution_hint is None:
+            self.solution_hint = self.get_greedy_solution()
+        hinted = self.warm_start and self.solution_hint is not None
+        cold_wall_time = None
+        if hinted and self.compare_cold_solve:
+            self.model.ClearHints()
+            cold_solver = self.get_solver()
+            cold_solver.Solve(self.model)
+            cold_wall_time = cold_solver.WallTime()
+        if hinted:
+            self.set_solution_hints()
 
-            # Create one list of assigned tasks per machine.
-            for i, task in enumerate(self.job.task_sequence):
-                if task.agent == "Both":
-                    if self.solver.Value(self.all_tasks[i].agent):
-                        agent = "Human"
-                    else:
-                        agent = "Robot"
-                else:
-                    agent = task.agent
-                self.assigned_jobs[agent].append(
-                    assigned_task_info(start=self.solver.Value(
-                        self.all_tasks[i].start),
-                        end=self.solver.Value(
-                            self.all_tasks[i].end),
-                        task_id=i,
-                        agent=agent))
-
-            for agent in self.job.agents:
-                # Sort by starting time.
-                self.assigned_jobs[agent].sort()
-                output[agent] = []
-                for assigned_task in self.assigned_jobs[agent]:
-                    start = assigned_task.start
-                    end = assigned_task.end
-
-                    task = self.job.task_sequence[assigned_task.task_id]
-                    self.job.task_sequence[assigned_task.task_id].agent = agent
-                    if (task.status == -1) or (task.status == 0) or (task.status is None):
-                        self.job.task_sequence[assigned_task.task_id].start = start
-                        self.job.task_sequence[assigned_task.task_id].finish = end
-                    elif task.status == 1:
-                        self.job.task_sequence[assigned_task.task_id].finish = \
-                            task.start + self.task_duration[task.agent][task.id][0]
-
-                    output[agent].append(self.job.task_sequence[assigned_task.task_id])
+        # Creates the solver and solve.
+        self.solver = self.get_solver()
+        self.solution_streamer = SolutionStreamer(self, on_solution) if on_solution else None
+        self.status = self.solver.Solve(self.model, self.solution_streamer)
+
+        if self.status == cp_model.OPTIMAL or self.status == cp_model.FEASIBLE:
+            self.save_solution()
             self.rescheduling_run_time.append([self.solver.StatusName(self.status),
-                                               self.solver.ObjectiveValue(), self.solver.WallTime()])
-            return output
+                                               self.solver.ObjectiveValue(), self.solver.WallTime(),
+                                               hinted, cold_wall_time])
+            if cold_wall_time is not None:
+                logging.info(f'Hinted solve: {self.solver.WallTime():.4f} s, cold solve: {cold_wall_time:.4f} s')
+            return True
+        return False
+
+    def parse_solution(self, solution):
+        """
+        Updates the tasks according to the solution and sorts them for each agent.
+
+        :param solution: Values of the solution, see get_solution_values.
+        :type solution: dict
+        :return: Schedula as sequence of tasks for each agent
+        :rtype agent: dictionary
+        """
+        return schedule_from_solution(self.job, self.task_duration, solution)
+
+    def get_greedy_solution(self):
+        """
+        Schedules the tasks which have not started yet by the list scheduling. Universal tasks
+        with fixed agents keep them.
+
+        :return: Values of the solution, see get_solution_values.
+        :rtype: dict
+        """
+        fixed_agents = [literal is not None for literal in self.keep_agent]
+        return ListSchedule(self.job, self.task_duration).get_solution(self.current_time, fixed_agents)
+
+    def run_greedy(self):
+        """
+        Saves the greedy schedule as solution if the solver has not found any.
+
+        :return: True if the greedy schedule has been found.
+        :rtype: bool
+        """
+        start = time.perf_counter()
+        try:
+            solution = self.get_greedy_solution()
+        except ValueError as error:
+            logging.error(f'Greedy schedule failed: {error}')
+            return False
+        objective = max(solution["End"], default=0) + rejection_penalty(self.job, solution)
+        logging.warning(f'Solver status {self.solver.StatusName(self.status)}, '
+                        f'greedy schedule is used, objective {objective}')
+        self.solution_hint = solution
+        self.rescheduling_run_time.append(['GREEDY', objective, time.perf_counter() - start, False, None])
+        return True
+
+    def start_anytime_schedule(self):
+        """
+        Creates the model and solves it in a background thread. Improving solutions are published
+        to a queue, the first feasible schedule is returned as soon as it is found. The cached schedule
+        of an unchanged job is returned without the search.
+
+        :return: First feasible schedula as sequence of tasks for each agent, None if the scheduling failed
+        :rtype agent: dictionary
+        """
+        self.set_variables()
+        cache_key = self.get_cache_key() if self.cache is not None else None
+        solution = self.cache.get(cache_key) if cache_key else None
+        if solution is not None:
+            schedule = self.load_cached_solution(solution)
+            print_schedule(schedule)
+            self.fix_agents_var()
+            logging.info(f'Cached schedule: status {solution["Status"]}, objective {solution["Objective"]}')
+            return schedule
+
+        self.set_constraints()
+        self.anytime_cache_key = cache_key
+        self.solution_queue = queue.Queue()
+        self.solving_thread = threading.Thread(target=self.run_anytime_solver, daemon=True)
+        self.solving_thread.start()
+
+        solution = self.solution_queue.get()
+        if solution is None:
+            self.solving_thread.join()
+            self.solving_thread = None
+            if not self.run_greedy():
+                logging.error(f"Scheduling failed, max self.horizon: {self.horizon} \n")
+                self.job.__str__()
+                return None
+            solution = self.solution_hint
         else:
-            logging.error(f"Scheduling failed, max self.horizon: {self.horizon} \n")
-            self.job.__str__()
-            exit()
+            logging.info(f'First feasible schedule: objective {solution["Objective"]}, '
+                         f'wall time {solution["Wall time"]:.4f} s')
+        schedule = self.parse_solution(solution)
+        print_schedule(schedule)
+        return schedule
+
+    def run_anytime_solver(self):
+        """
+        Runs the solver, the end of the search is published as None.
+        """
+        if self.run_solver(self.solution_queue.put) and self.anytime_cache_key:
+            self.cache.put(self.anytime_cache_key, dict(self.solution_hint, Objective=self.solver.ObjectiveValue(),
+                                                        Status=self.solver.StatusName(self.status)))
+        self.solution_queue.put(None)
+
+    def is_solving(self):
+        """
+        Checks whether the anytime search is running.
+
+        :rtype: bool
+        """
+        return self.solving_thread is not None
+
+    def get_schedule_update(self):
+        """
+        Returns the schedule of the best solution published since the last call. Solutions which
+        reassign already started tasks are skipped. When the search is over, the agents are fixed.
+
+        :return: Improved schedula as sequence of tasks for each agent, None if there is none.
+        :rtype agent: dictionary
+        """
+        if not self.is_solving():
+            return None
+        solution = None
+        finished = False
+        while not self.solution_queue.empty():
+            update = self.solution_queue.get()
+            if update is None:
+                finished = True
+            elif self.is_consistent(update):
+                solution = update
+
+        schedule = None
+        if solution is not None:
+            logging.info(f'Improved schedule: objective {solution["Objective"]}, '
+                         f'wall time {solution["Wall time"]:.4f} s')
+            schedule = self.parse_solution(solution)
+        if finished:
+            self.solving_thread.join()
+            self.solving_thread = None
+            self.fix_agents_var()
+            self.print_info()
+        return schedule
+
+    def finish_anytime_schedule(self):
+        """
+        Stops the anytime search and returns the last improved schedule.
+
+        :return: Improved schedula as sequence of tasks for each agent, None if there is none.
+        :rtype agent: dictionary
+        """
+        if not self.is_solving():
+            return None
+        # The stopped search has not finished, so its solution is not cached
+        self.anytime_cache_key = None
+        if self.solution_streamer is not None:
+            self.solution_streamer.StopSearch()
+        self.solving_thread.join()
+        return self.get_schedule_update()
+
+    def is_consistent(self, solution):
+        """
+        Checks whether the solution keeps the agents of the started tasks.
+
+        :param solution: Values of the solution, see get_solution_values.
+        :type solution: dict
+        :rtype: bool
+        """
+        for i, task in enumerate(self.job.task_sequence):
+            if task.universal and task.status in [1, 2] and solution["Agent"][i] != self.job.agents.index(task.agent):
+                return False
+        return True
+
+    def get_solver(self):
+        """
+        Creates the solver with the parameters used for scheduling.
+
+        :return: Solver
+        :rtype: CpSolver
+        """
+        solver = cp_model.CpSolver()
+        solver.parameters.random_seed = SOLVER_SEED
+        solver.parameters.max_time_in_seconds = self.time_limit
+        if self.relative_gap:
+            solver.parameters.relative_gap_limit = self.relative_gap
+        if self.solver_workers:
+            solver.parameters.num_workers = self.solver_workers
+        return solver
+
+    def get_solution_values(self, value):
+        """
+        Returns the values of the variables of a solution.
+
+        :param value: Function returning the value of a variable, e.g. CpSolver.Value.
+        :type value: function
+        :return: Starts, ends, durations and agents (indices into job.agents) of all tasks.
+        :rtype: dict
+        """
+        return {
+            "Start": [value(var) for var in self.start_var],
+            "End": [value(var) for var in self.end_var],
+            "Duration": [value(var) for var in self.duration],
+            "Agent": [next(a for a, literal in agent_bool.items() if value(literal))
+                      for agent_bool in self.agent_bool]}
+
+    def save_solution(self):
+        """
+        Saves the values of the last feasible solution to use them as hints for rescheduling.
+        """
+        self.solution_hint = self.get_solution_values(self.solver.Value)
+
+    def set_solution_hints(self):
+        """
+        Sets the last feasible solution as hints. Hints of the tasks that have been given
+        to another agent or whose domains have been changed by refresh_variables are repaired.
+        """
+        self.model.ClearHints()
+        for i, task in enumerate(self.job.task_sequence):
+            agent = self.solution_hint["Agent"][i]
+            duration = self.solution_hint["Duration"][i]
+            if task.agent in self.job.agents and self.job.agents.index(task.agent) != agent:
+                agent = self.job.agents.index(task.agent)
+                duration = int(self.duration_matrix[i, agent, 0])
+
+            duration = closest_in_domain(duration, self.get_domain(self.duration[i]))
+            start = closest_in_domain(self.solution_hint["Start"][i], self.get_domain(self.start_var[i]))
+            end = closest_in_domain(start + duration, self.get_domain(self.end_var[i]))
+
+            for a, literal in self.agent_bool[i].items():
+                self.model.AddHint(literal, int(a == agent))
+            self.model.AddHint(self.duration[i], duration)
+            self.model.AddHint(self.start_var[i], start)
+            self.model.AddHint(self.end_var[i], end)
+
+    def get_domain(self, var):
+        """
+        Returns the current domain of the variable as flattened intervals.
+
+        :param var: Model variable.
+        :type var: IntVar
+        :return: Flattened intervals of the domain.
+        :rtype: list
+        """
+        return list(self.model.Proto().variables[var.Index()].domain)
 
     def fix_agents_var(self):
         """
-        Sets allocated agents variable as hard constraints.
+        Sets allocated agents variable as constraints enforced by assumptions.
         """
         for i, task in enumerate(self.job.task_sequence):
-            if task.universal:
-                if task.agent == "Human":
-                    self.fix_agent[i] = self.model.Add(self.human_task_bool[i] == True)
-                else:
-                    self.fix_agent[i] = self.model.Add(self.human_task_bool[i] == False)
+            if len(self.agent_bool[i]) > 1:
+                self.set_agent_literal(i, task.agent)
+
+    def set_agent_literal(self, idx, agent):
+        """
+        Fixes the agent variable of the task by a constraint enforced by a new literal. The literal is passed to
+        the solver as assumption, so the constraint can be dropped without removing it from the model.
+        The constraint of the previous agent is deactivated.
+
+        :param idx: Index of the task.
+        :type idx: int
+        :param agent: Name of the allocated agent.
+        :type agent: str
+        """
+        self.constraints.deactivate(('fix_agent', idx))
+        self.keep_agent[idx] = self.model.NewBoolVar(f'keep_agent_{self.job.task_sequence[idx].id}')
+        self.fix_agent[idx] = self.constraints.add(('fix_agent', idx), self.model.Add(
+            self.agent_bool[idx][self.job.agents.index(agent)] == True).OnlyEnforceIf(self.keep_agent[idx]))
 
     def set_new_agent(self, task):
         """
@@ -283,71 +650,221 @@ class Schedule:
         :type task: Task
         """
         idx = self.job.task_sequence.index(task)
-        self.model.Proto().constraints.remove(self.fix_agent[idx].Proto())
-        if task.agent == "Human":
-            self.model.Add(self.human_task_bool[idx] == True)
-        else:
-            self.model.Add(self.human_task_bool[idx] == False)
+        self.set_agent_literal(idx, task.agent)
+
+    def get_assumptions(self, idx=None, agent=None):
+        """
+        Returns the literals keeping the allocated agents. If the task index is given, its agent
+        literal is replaced by the literal of the new agent.
+
+        :param idx: Index of the task to be redirected to another agent.
+        :type idx: int
+        :param agent: Name of the agent the task is redirected to.
+        :type agent: str
+        :return: List of literals.
+        :rtype: list
+        """
+        assumptions = [literal for i, literal in enumerate(self.keep_agent) if literal is not None and i != idx]
+        if idx is not None:
+            assumptions.append(self.agent_bool[idx][self.job.agents.index(agent)])
+        return assumptions
 
     def set_max_horizon(self):
         """
-        Computes horizon dynamically as the sum of all durations.
+        Computes horizon dynamically as the sum of the longest durations of the tasks by the agents
+        which can execute them.
         :return:
         """
-        self.horizon = 0
         self.set_duration_of_all_tasks()
-        for i, task in enumerate(self.job.task_sequence):
-            if task.universal:
-                self.horizon += max(self.task_duration['Human'][i][0], self.task_duration['Robot'][i][0])
-            else:
-                self.horizon += self.task_duration[task.agent][i][0]
-        self.horizon = int(self.horizon)
+        self.horizon = int(np.where(self.allowed_agents, self.duration_matrix[:, :, 0], 0).max(axis=1).sum())
+
+    def set_time_bounds(self):
+        """
+        Computes the earliest start and the latest finish of each task. The horizon is tightened
+        to the objective of the greedy schedule, which bounds the makespan of the optimal schedule.
+        """
+        self.earliest_start = [0] * self.job.task_number
+        self.latest_finish = [self.horizon] * self.job.task_number
+        if not self.tighten_bounds:
+            return
+        solution = ListSchedule(self.job, self.task_duration).get_solution(self.current_time)
+        horizon = min(self.horizon, max(solution["End"]) + rejection_penalty(self.job, solution))
+        logging.debug(f'Horizon {self.horizon}, greedy schedule horizon {horizon}')
+        self.earliest_start, self.latest_finish = time_bounds(self.job.task_sequence, self.task_duration, horizon)
 
     def set_duration_of_all_tasks(self):
         """
-        Set durations of all tasks by each agent
+        Set durations of all tasks by each agent from the duration table of the job.
         """
-        for task in self.job.task_sequence:
-            self.task_duration["Human"].append(set_task_time(task, 'Human'))
-            self.task_duration["Robot"].append(set_task_time(task, 'Robot'))
+        self.set_duration_matrix(self.job.get_duration_table().durations)
 
-    def set_schedule(self):
+    def set_duration_matrix(self, duration_matrix):
+        """
+        Sets the durations and the agents which can execute each task.
+
+        :param duration_matrix: Durations of tasks by each agent, tasks x agents x [total, preparation,
+                                execution, completion].
+        :type duration_matrix: numpy.ndarray
+        """
+        self.duration_matrix = np.asarray(duration_matrix, dtype=int)
+        self.task_duration = {agent: self.duration_matrix[:, a].tolist() for a, agent in enumerate(self.job.agents)}
+        self.allowed_agents = np.zeros((self.job.task_number, len(self.job.agents)), dtype=bool)
+        for i, task in enumerate(self.job.task_sequence):
+            agents = get_agents(task, self.job.agents)
+            if len(agents) == 0:
+                raise ValueError(f'No agent of the job can execute the task {task.id} of {task.agent}')
+            self.allowed_agents[i, [self.job.agents.index(agent) for agent in agents]] = True
+
+    def set_schedule(self, on_solution=None):
         """
         Creates variables, theis domains and constraints in model, then solves it.
+
+        :param on_solution: Function called with each improving solution found during the search.
+        :type on_solution: function
+        :return: Schedula as sequence of tasks for each agent, None if the scheduling failed
+        :rtype agent: dictionary
         """
         self.set_variables()
-        self.set_constraints()
-        schedule = self.solve()
+        cache_key = self.get_cache_key() if self.cache is not None else None
+        solution = self.cache.get(cache_key) if cache_key else None
+        if solution is not None:
+            schedule = self.load_cached_solution(solution, on_solution)
+        else:
+            self.set_constraints()
+            schedule = self.solve(on_solution)
+            if schedule is None:
+                return None
+            if cache_key and (self.status == cp_model.OPTIMAL or self.status == cp_model.FEASIBLE):
+                self.cache.put(cache_key, dict(self.solution_hint, Objective=self.solver.ObjectiveValue(),
+                                               Status=self.solver.StatusName(self.status)))
         print_schedule(schedule)
         self.fix_agents_var()
-        self.print_info()
+        if solution is not None:
+            logging.info(f'Cached schedule: status {solution["Status"]}, objective {solution["Objective"]}')
+        else:
+            self.print_info()
         return schedule
 
+    def get_cache_key(self):
+        """
+        Returns the fingerprint of the job, durations of its tasks, seed of the simulation and solver parameters.
+
+        :rtype: str
+        """
+        solver_param = {'Formulation': self.formulation, 'Time limit': self.time_limit,
+                        'Relative gap': self.relative_gap, 'Tighten bounds': self.tighten_bounds,
+                        'Warm start': self.warm_start, 'Lambda': LAMBDA, 'Solver seed': SOLVER_SEED,
+                        'OR-Tools': ortools.__version__, 'Agents': self.job.agents,
+                        'Solver workers': self.solver_workers}
+        seed = self.job.config.seed if self.job.seed is None else self.job.seed
+        return fingerprint(self.job.task_sequence, self.task_duration, seed, solver_param)
+
+    def load_cached_solution(self, solution, on_solution=None):
+        """
+        Uses the cached solution instead of solving the model.
+
+        :param solution: Cached values of the solution, see get_solution_values.
+        :type solution: dict
+        :param on_solution: Function called with the solution.
+        :type on_solution: function
+        :return: Schedula as sequence of tasks for each agent
+        :rtype agent: dictionary
+        """
+        self.solution_hint = {name: solution[name] for name in ["Start", "End", "Duration", "Agent"]}
+        self.rescheduling_run_time.append(['CACHED', solution["Objective"], 0, False, None])
+        if on_solution:
+            on_solution(dict(self.solution_hint, Objective=solution["Objective"], **{"Wall time": 0.0}))
+        return self.parse_solution(self.solution_hint)
+
     def set_list_of_possible_changes(self, available_tasks, agent):
-        makespans = []
-        for available_task in available_tasks:
-            if available_task.id not in agent.rejection_tasks:
-                test_model = copy.deepcopy(self.model)
-                human_task_bool_copy = copy.deepcopy(self.human_task_bool)
-                idx = self.job.get_task_idx(available_task)
-                test_model.Proto().constraints.remove(self.fix_agent[idx].Proto())
-                if agent.name == "Human":
-                    test_model.Add(human_task_bool_copy[idx] == True)
+        """
+        Evaluates the makespan of the schedule for each available task given to the agent. Each candidate
+        is solved under assumptions, which replace the agent literal of the task. With more workers the
+        candidates are solved concurrently, each from the serialized model and its assumptions.
+
+        :param available_tasks: Tasks which the agent can take over.
+        :type available_tasks: list
+        :param agent: Agent taking over the task.
+        :type agent: Agent
+        :return: Sorted list of objective values and tasks, None if no change is feasible.
+        :rtype: list
+        """
+        candidates = [task for task in available_tasks if task.id not in agent.rejection_tasks]
+        if len(candidates) == 0:
+            return None
+
+        self.set_constraints()
+        rounds = math.ceil(len(candidates) / self.evaluation_workers)
+        time_limit = self.evaluation_time_budget / rounds
+        if self.evaluation_workers == 1:
+            results = [self.evaluate_change(self.job.get_task_idx(task), agent.name, time_limit)
+                       for task in candidates]
+        else:
+            model_proto = self.model.Proto().SerializeToString()
+            # The cores are shared by the workers, so their solvers do not oversubscribe them
+            solver_workers = max(1, (os.cpu_count() or 1) // self.evaluation_workers)
+            if self.evaluation_pool is None:
+                self.evaluation_pool = ProcessPoolExecutor(max_workers=self.evaluation_workers)
+            futures = []
+            for available_task in candidates:
+                assumptions = self.get_assumptions(self.job.get_task_idx(available_task), agent.name)
+                futures.append(self.evaluation_pool.submit(
+                    evaluate_change, model_proto, [literal.Index() for literal in assumptions], time_limit,
+                    solver_workers, SOLVER_SEED))
+            wait(futures, timeout=self.evaluation_time_budget + 1.0)
+            results = []
+            for future in futures:
+                if future.done() and not future.cancelled():
+                    results.append(future.result())
                 else:
-                    test_model.Add(human_task_bool_copy[idx] == False)
-                solver = cp_model.CpSolver()
-                status = solver.Solve(test_model)
-                if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-                    makespans.append([solver.ObjectiveValue(), available_task])
-                    self.evaluation_run_time.append(solver.WallTime())
+                    future.cancel()
+                    results.append(None)
+
+        makespans = []
+        for available_task, result in zip(candidates, results):
+            if result is not None:
+                objective, wall_time = result
+                makespans.append([objective, available_task])
+                self.evaluation_run_time.append(wall_time)
 
         if len(makespans) == 0:
             return None
-        elif len(makespans) > 1:
-            makespans.sort(key=lambda x: x[0])
-            return makespans
-        else:
-            return makespans
+        makespans.sort(key=lambda x: x[0])
+        return makespans
+
+    def evaluate_change(self, idx, agent, time_limit):
+        """
+        Solves the model with the task redirected to another agent under assumptions.
+
+        :param idx: Index of the task.
+        :type idx: int
+        :param agent: Name of the agent the task is redirected to.
+        :type agent: str
+        :param time_limit: Time limit in seconds.
+        :type time_limit: float
+        :return: Objective value and wall time, None if no solution has been found.
+        :rtype: tuple
+        """
+        self.set_constraints()
+        self.model.ClearAssumptions()
+        self.model.AddAssumptions(self.get_assumptions(idx, agent))
+        solver = cp_model.CpSolver()
+        solver.parameters.random_seed = SOLVER_SEED
+        solver.parameters.max_time_in_seconds = time_limit
+        status = solver.Solve(self.model)
+        self.model.ClearAssumptions()
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            return solver.ObjectiveValue(), solver.WallTime()
+        return None
+
+    def close(self):
+        """
+        Stops the anytime search and shuts down the worker processes evaluating possible changes.
+        """
+        self.finish_anytime_schedule()
+        if self.evaluation_pool is not None:
+            self.evaluation_pool.shutdown(cancel_futures=True)
+            self.evaluation_pool = None
 
     def print_info(self):
         """
@@ -361,9 +878,94 @@ class Schedule:
         logging.info('  - wall time : %f s' % self.solver.WallTime())
 
 
+class SolutionStreamer(cp_model.CpSolverSolutionCallback):
+    """
+    Publishes each improving solution found by the solver.
+
+    :param schedule_model: Schedule whose model is solved.
+    :type schedule_model: Schedule
+    :param on_solution: Function called with the values of the solution, its objective and wall time.
+    :type on_solution: function
+    """
+    def __init__(self, schedule_model, on_solution):
+        super().__init__()
+        self.schedule_model = schedule_model
+        self.on_solution = on_solution
+
+    def on_solution_callback(self):
+        solution = self.schedule_model.get_solution_values(self.Value)
+        solution["Objective"] = self.ObjectiveValue()
+        solution["Wall time"] = self.WallTime()
+        self.on_solution(solution)
+
+
+def evaluate_change(model_proto, assumptions, time_limit, num_workers=1, random_seed=SOLVER_SEED):
+    """
+    Solves the serialized model under the given assumptions. Runs in a worker process.
+
+    :param model_proto: Serialized model.
+    :type model_proto: bytes
+    :param assumptions: Indices of the assumed literals.
+    :type assumptions: list
+    :param time_limit: Time limit in seconds.
+    :type time_limit: float
+    :param num_workers: Number of search workers of the solver.
+    :type num_workers: int
+    :param random_seed: Seed of the solver.
+    :type random_seed: int
+    :return: Objective value and wall time, None if no solution has been found.
+    :rtype: tuple
+    """
+    model = cp_model.CpModel()
+    model.Proto().ParseFromString(model_proto)
+    model.Proto().assumptions[:] = assumptions
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_workers = num_workers
+    solver.parameters.random_seed = random_seed
+    status = solver.Solve(model)
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        return solver.ObjectiveValue(), solver.WallTime()
+    return None
+
+
+def closest_in_domain(value, domain):
+    """
+    Returns the value of the domain closest to the given value.
+
+    :param value: Value to be moved into the domain.
+    :type value: int
+    :param domain: Flattened intervals of the domain.
+    :type domain: list
+    :return: Closest value of the domain.
+    :rtype: int
+    """
+    closest = None
+    for lower_bound, upper_bound in zip(domain[::2], domain[1::2]):
+        candidate = min(max(value, lower_bound), upper_bound)
+        if closest is None or abs(candidate - value) < abs(closest - value):
+            closest = candidate
+    return closest
+
+
+def rejection_penalty(job, solution):
+    """
+    Returns the highest penalty of rejection of the universal tasks allocated to human agents.
+
+    :param job: Scheduled job.
+    :type job: Job
+    :param solution: Values of the solution, see Schedule.get_solution_values.
+    :type solution: dict
+    :rtype: int
+    """
+    return max([int(LAMBDA * task.get_reject_prob() * 10) for i, task in enumerate(job.task_sequence)
+                if task.universal and get_agent_kind(job.agents[solution["Agent"][i]]) == "Human"], default=0)
+
+
 def schedule_as_dict(schedule):
-    schedule_as_dict = {'Human': [], 'Robot': []}
-    for agent in ["Human", "Robot"]:
+    schedule_as_dict = {}
+    for agent in schedule:
+        schedule_as_dict[agent] = []
         for task in schedule[agent]:
             schedule_as_dict[agent].append(task.as_dict())
     return schedule_as_dict
@@ -372,10 +974,8 @@ def schedule_as_dict(schedule):
 def print_schedule(schedule):
     logging.info("____________________________")
     logging.info("INFO: Task distribution")
-    logging.info("Robot")
-    for task in schedule["Robot"]:
-        task.__str__()
-    logging.info("Human")
-    for task in schedule["Human"]:
-        task.__str__()
+    for agent in sorted(schedule, key=lambda agent: get_agent_kind(agent) != "Robot"):
+        logging.info(agent)
+        for task in schedule[agent]:
+            task.__str__()
     logging.info("____________________________")
@@ -1,5 +1,3 @@
-import os
-
+from simulation.sim_config import SimConfig, get_config, sim_param_path
 from simulation.sim import Sim
-from simulation.task_execution_time_const import get_approximated_task_duration
-sim_param_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+from simulation.task_execution_time_const import get_approximated_task_duration, Workspace, WORKSPACE
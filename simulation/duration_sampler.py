@@ -0,0 +1,117 @@
+"""
+    DurationSampler class samples the durations of tasks from the mixture of the successful and the failed execution.
+"""
+from simulation.task_execution_time_const import WORKSPACE
+import numpy as np
+
+# Standard deviation of the duration of a phase by each kind of agents
+SCALE = {'Human': 2, 'Robot': 1}
+# Kinds of agents in the order of their streams of random numbers
+KINDS = list(SCALE)
+# The failed execution of a phase takes longer with a larger deviation
+FAIL_FACTOR = 3
+# Multipliers and key increments of the Philox4x32-10 generator
+PHILOX_M = (0xD2511F53, 0xCD9E8D57)
+PHILOX_W = (0x9E3779B9, 0xBB67AE85)
+PHILOX_ROUNDS = 10
+MASK_32 = np.uint64(0xFFFFFFFF)
+
+
+class DurationSampler:
+    """
+    Samples the durations of phases directly from the two-component mixture. With the fail probability the phase
+    is drawn from the failed component with FAIL_FACTOR times longer mean and deviation, otherwise from the
+    successful one. The random numbers come from the counter-based Philox generator keyed by the seed, the ID
+    of the task and the kind of agents, and counted by the scenario and the phase. All of them are drawn at
+    once, yet the durations of a task do not depend on the other sampled tasks, kinds and scenarios, so the
+    durations of a whole job and of a single task are the same given the seed.
+
+    :param seed: Seed of the generator.
+    :type seed: int
+    :param fail_prob: Weights of the failed and of the successful execution.
+    :type fail_prob: list
+    :param workspace: Workspace with the mean durations of the phases.
+    :type workspace: Workspace
+    """
+    def __init__(self, seed, fail_prob, workspace=WORKSPACE):
+        self.seed = seed
+        self.workspace = workspace
+        self.fail_prob = fail_prob[0] / (fail_prob[0] + fail_prob[1])
+
+    def sample(self, actions, kinds, scenarios=None, ids=None):
+        """
+        Samples the durations of the actions by each kind of agents.
+
+        :param actions: Actions of the tasks, objects and places.
+        :type actions: list
+        :param kinds: Kinds of agents, Human or Robot.
+        :type kinds: list
+        :param scenarios: Number of independent scenarios, None for a single one.
+        :type scenarios: int
+        :param ids: IDs of the tasks, defaults to the indices of the actions.
+        :type ids: list
+        :return: Array of [scenarios x] tasks x kinds x [total, preparation, execution, completion].
+        :rtype: numpy.ndarray
+        """
+        objects = np.array([action['Object'] for action in actions], dtype=str)[:, np.newaxis]
+        places = np.array([action['Place'] for action in actions], dtype=str)[:, np.newaxis]
+        mean = self.workspace.get_durations(np.array(kinds)[np.newaxis, :], objects, places)
+        scale = np.array([SCALE[kind] for kind in kinds])[:, np.newaxis]
+        if ids is None:
+            ids = range(len(actions))
+        shape = (scenarios or 1,) + mean.shape
+        seed = np.uint64(self.seed % 2 ** 64)
+        # Key of each task and kind, the upper half of the seed is in the counter
+        key = (np.full(shape[1:3], seed & MASK_32),
+               np.array(ids, dtype=np.uint64)[:, np.newaxis] * np.uint64(len(KINDS)) +
+               np.array([KINDS.index(kind) for kind in kinds], dtype=np.uint64)[np.newaxis, :])
+        counter = (np.arange(shape[0], dtype=np.uint64)[:, np.newaxis, np.newaxis, np.newaxis],
+                   np.arange(shape[3], dtype=np.uint64), np.uint64(0), seed >> np.uint64(32))
+        counter = [np.broadcast_to(c, shape) for c in counter]
+        fail_bits, radius_bits, angle_bits, _ = philox(counter, [k[..., np.newaxis] for k in key])
+        failed = to_uniform(fail_bits) < self.fail_prob
+        # Box-Muller transform of two uniform numbers to the standard normal noise
+        noise = np.sqrt(-2 * np.log(to_uniform(radius_bits))) * np.cos(2 * np.pi * to_uniform(angle_bits))
+        phases = (np.where(failed, FAIL_FACTOR, 1) * (mean + scale * noise)).astype(int)
+        phases = np.maximum(phases, 1)
+        # Tasks which the kind of agents cannot execute keep zero durations
+        phases = np.where(mean[:, :, :1] != 0, phases, mean)
+
+        durations = np.concatenate([phases.sum(axis=-1, keepdims=True), phases], axis=-1)
+        return durations if scenarios else durations[0]
+
+
+def philox(counter, key):
+    """
+    Philox4x32-10 counter-based generator applied elementwise, each counter and key gives its own block of
+    four independent random numbers.
+
+    :param counter: Four arrays of 32-bit words of the counter.
+    :type counter: list
+    :param key: Two arrays of 32-bit words of the key.
+    :type key: list
+    :return: Four arrays of random 32-bit words.
+    :rtype: list
+    """
+    c0, c1, c2, c3 = [np.asarray(c, dtype=np.uint64) & MASK_32 for c in counter]
+    k0, k1 = [np.asarray(k, dtype=np.uint64) & MASK_32 for k in key]
+    for r in range(PHILOX_ROUNDS):
+        if r:
+            k0 = (k0 + np.uint64(PHILOX_W[0])) & MASK_32
+            k1 = (k1 + np.uint64(PHILOX_W[1])) & MASK_32
+        product0 = c0 * np.uint64(PHILOX_M[0])
+        product1 = c2 * np.uint64(PHILOX_M[1])
+        c0, c1, c2, c3 = ((product1 >> np.uint64(32)) ^ c1 ^ k0, product1 & MASK_32,
+                          (product0 >> np.uint64(32)) ^ c3 ^ k1, product0 & MASK_32)
+    return [c0, c1, c2, c3]
+
+
+def to_uniform(bits):
+    """
+    Maps random 32-bit words to uniform numbers in the open interval (0, 1).
+
+    :param bits: Random 32-bit words.
+    :type bits: numpy.ndarray
+    :rtype: numpy.ndarray
+    """
+    return (bits + 0.5) / 2 ** 32
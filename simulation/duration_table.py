@@ -0,0 +1,84 @@
+"""
+    DurationTable class holds the durations of all tasks of a job by each agent.
+"""
+from simulation.duration_sampler import DurationSampler
+from simulation.sim_config import get_config
+from simulation.sim import get_agent_kind
+
+
+class DurationTable:
+    """
+    Durations of tasks as an array of tasks x agents x [total, preparation, execution, completion].
+    Durations are sampled once for each kind of agents, agents of the same kind share them.
+
+    :param tasks: Sequence of tasks.
+    :type tasks: list
+    :param agents: Names of the agents.
+    :type agents: list
+    :param seed: Seed of the durations, defaults to the seed of the simulation config.
+    :type seed: int
+    :param fail_prob: Probabilities of the failed and of the successful execution, defaults to the config.
+    :type fail_prob: list
+    :param config: Parameters of the simulation, defaults to the config file.
+    :type config: SimConfig
+    """
+    def __init__(self, tasks, agents, seed=None, fail_prob=None, config=None):
+        config = config or get_config()
+        self.agents = list(agents)
+        self.seed = config.seed if seed is None else seed
+        self.fail_prob = config.fail_probability if fail_prob is None else fail_prob
+        self.index = {task.id: i for i, task in enumerate(tasks)}
+        self.durations = sample_durations(tasks, self.agents, self.seed, self.fail_prob)
+
+        # Agents outside of the table are looked up by their kind
+        self.agent_index = {}
+        for a, agent in enumerate(self.agents):
+            self.agent_index.setdefault(get_agent_kind(agent), a)
+            self.agent_index[agent] = a
+
+    def get(self, task_id, agent):
+        """
+        Returns the durations of the task by the agent.
+
+        :param task_id: ID of the task.
+        :type task_id: int
+        :param agent: Name or kind of the agent.
+        :type agent: str
+        :return: Total duration and durations of preparation, execution and completion.
+        :rtype: list
+        """
+        a = self.agent_index.get(agent)
+        if a is None:
+            a = self.agent_index[get_agent_kind(agent)]
+        return self.durations[self.index[task_id], a].tolist()
+
+    def as_dict(self):
+        """
+        Returns the durations of tasks in the order of the tasks for each agent.
+
+        :rtype: dict
+        """
+        return {agent: self.durations[:, a].tolist() for a, agent in enumerate(self.agents)}
+
+
+def sample_durations(tasks, agents, seed, fail_prob, scenarios=None):
+    """
+    Samples the durations of tasks by each agent, agents of the same kind share the durations.
+
+    :param tasks: Sequence of tasks.
+    :type tasks: list
+    :param agents: Names of the agents.
+    :type agents: list
+    :param seed: Seed of the durations.
+    :type seed: int
+    :param fail_prob: Probabilities of the failed and of the successful execution.
+    :type fail_prob: list
+    :param scenarios: Number of independent scenarios, None for a single one.
+    :type scenarios: int
+    :return: Array of [scenarios x] tasks x agents x [total, preparation, execution, completion].
+    :rtype: numpy.ndarray
+    """
+    kinds = list(dict.fromkeys(get_agent_kind(agent) for agent in agents))
+    durations = DurationSampler(seed, fail_prob).sample([task.action for task in tasks], kinds, scenarios,
+                                                        [task.id for task in tasks])
+    return durations[..., [kinds.index(get_agent_kind(agent)) for agent in agents], :]
@@ -4,11 +4,11 @@
     @author: Marina Ionova, student of Cybernetics and Robotics at the CTU in Prague
     @contact: marina.ionova@cvut.cz
 """
-from simulation.task_execution_time_const import get_approximated_task_duration
+from simulation.sim_config import get_config
 from numpy.random import Generator, choice
 import numpy as np
+import collections
 import logging
-import json
 import time
 
 
@@ -17,26 +17,32 @@ class Sim:
     A class that simulates the execution of tasks based on the probability
     distribution of their duration, as well as the choice of a person
     who is offered to him by the control logic.
+
+    :param config: Parameters of the simulation, defaults to the config file.
+    :type config: SimConfig
     """
-    def __init__(self):
+    def __init__(self, config=None):
+        self.config = None
         self.weights = None
         self.prob = None
         self.seed = None
         self.fail_probability = []
-        self.task_execution = {'Human': {'Start': 0, 'Duration': []}, 'Robot': {'Start': 0, 'Duration': []}}
+        self.task_execution = collections.defaultdict(lambda: {'Start': 0, 'Duration': []})
         self.start_time = time.time()
 
-        self.set_param()
+        self.set_param(config)
 
-    def set_param(self):
+    def set_param(self, config=None):
         """
-        Sets simulation parameters from config file.
+        Sets simulation parameters from the config.
+
+        :param config: Parameters of the simulation, defaults to the config file.
+        :type config: SimConfig
         """
-        with open('./simulation/config.json') as f:
-            param = json.load(f)
-        self.seed = param['Seed']
-        self.weights = param['Allocation weights']
-        self.fail_probability = param['Fail probability']
+        self.config = config or get_config()
+        self.seed = self.config.seed
+        self.weights = self.config.allocation_weights
+        self.fail_probability = self.config.fail_probability
 
     def set_task_end(self, agent, job, current_time):
         """
@@ -53,8 +59,9 @@ class Sim:
         :rtype: int
         """
         self.task_execution[agent.name]['Start'] = current_time
-        self.task_execution[agent.name]['Duration'] = set_task_time(agent.current_task, seed=self.seed,
-                                                                    fail_prob=self.fail_probability)
+        duration_table = job.get_duration_table(self.seed, self.fail_probability)
+        self.task_execution[agent.name]['Duration'] = duration_table.get(agent.current_task.id,
+                                                                         agent.current_task.agent)
         dependent_task = check_dependencies(job, agent.current_task)
         if dependent_task:
             overlapping = dependent_task.start + sum(
@@ -79,7 +86,7 @@ class Sim:
         """
         nameList = [True, False]
         if question_type == 'change_agent':
-            if task.agent == 'Robot':
+            if get_agent_kind(task.agent) == 'Robot':
                 np.random.seed(self.seed + task.id)
                 answer = choice(nameList,  p=(task.get_reject_prob(), 1-task.get_reject_prob()), size=1)
                 logging.info(f'Offer to complete task {task.id} instead of robot. Answer {answer[0]}')
@@ -109,29 +116,27 @@ class Sim:
         :return: Status of task and time information.
         :rtype: tuple
         """
-        if self.task_execution['Robot']['Duration'][0] != 0:
-            logging.debug(
-                f'start: {self.task_execution["Robot"]["Start"]}, duration :{self.task_execution["Robot"]["Duration"]}')
-            if current_time < (self.task_execution['Robot']['Start'] + self.task_execution['Robot']['Duration'][1]):
+        execution = self.task_execution[task.agent]
+        if execution['Duration'][0] != 0:
+            logging.debug(f'start: {execution["Start"]}, duration :{execution["Duration"]}')
+            if current_time < (execution['Start'] + execution['Duration'][1]):
                 return 'Preparation', -1
-            elif current_time < (self.task_execution['Robot']['Start'] + self.task_execution['Robot']['Duration'][0] -
-                                 self.task_execution['Robot']['Duration'][3]):
+            elif current_time < (execution['Start'] + execution['Duration'][0] - execution['Duration'][3]):
                 dependent_task = check_dependencies(job, task)
-                if dependent_task and current_time < (self.task_execution['Human']['Start'] +
-                                                      (self.task_execution['Human']['Duration'][0] -
-                                                       self.task_execution['Human']['Duration'][3])):
-                    return 'Waiting', current_time - (self.task_execution['Robot']['Start'] +
-                                                      self.task_execution['Robot']['Duration'][1])
+                if dependent_task and current_time < (self.task_execution[dependent_task.agent]['Start'] +
+                                                      (self.task_execution[dependent_task.agent]['Duration'][0] -
+                                                       self.task_execution[dependent_task.agent]['Duration'][3])):
+                    return 'Waiting', current_time - (execution['Start'] + execution['Duration'][1])
                 else:
                     return 'Execution', -1
 
-            elif current_time < (self.task_execution['Robot']['Start'] + self.task_execution['Robot']['Duration'][0]):
+            elif current_time < (execution['Start'] + execution['Duration'][0]):
                 return 'Completion', -1
             else:
-                time_info = self.task_execution['Robot']['Duration']
-                time_info[0] += self.task_execution['Robot']['Start']
-                self.task_execution['Robot']['Start'] = 0
-                self.task_execution['Robot']['Duration'] = [0, 0, 0, 0]
+                time_info = execution['Duration']
+                time_info[0] += execution['Start']
+                execution['Start'] = 0
+                execution['Duration'] = [0, 0, 0, 0]
                 return 'Completed', time_info
 
     def check_human_task(self, task, job, current_time):
@@ -147,72 +152,83 @@ class Sim:
         :return: Status of task and time information.
         :rtype: tuple
         """
-        if self.task_execution['Human']['Duration'] != 0:
-            if (self.task_execution['Human']['Start'] + self.task_execution['Human']['Duration'][0]) \
-                    > current_time:
+        execution = self.task_execution[task.agent]
+        if execution['Duration'] != 0:
+            if (execution['Start'] + execution['Duration'][0]) > current_time:
                 dependent_task = check_dependencies(job, task)
-                if dependent_task and current_time < (self.task_execution['Robot']['Start'] +
-                                                      (self.task_execution['Robot']['Duration'][0] -
-                                                       self.task_execution['Robot']['Duration'][3])):
-                    return 'Waiting', current_time - (self.task_execution['Human']['Start'] +
-                                                      self.task_execution['Human']['Duration'][1])
+                if dependent_task and current_time < (self.task_execution[dependent_task.agent]['Start'] +
+                                                      (self.task_execution[dependent_task.agent]['Duration'][0] -
+                                                       self.task_execution[dependent_task.agent]['Duration'][3])):
+                    return 'Waiting', current_time - (execution['Start'] + execution['Duration'][1])
                 else:
                     return 'In progress', -1
             else:
-                time_info = self.task_execution['Human']['Duration']
-                time_info[0] += self.task_execution['Human']['Start']
-                self.task_execution['Human']['Start'] = 0
-                self.task_execution['Human']['Duration'] = [0, 0, 0, 0]
+                time_info = execution['Duration']
+                time_info[0] += execution['Start']
+                execution['Start'] = 0
+                execution['Duration'] = [0, 0, 0, 0]
                 return 'Completed', time_info
 
 
-def get_param(param_name):
-    with open('./simulation/config.json', 'r') as f:
-        sim_param = json.load(f)
-    return sim_param[param_name]
+def get_agent_kind(agent):
+    """
+    Returns the kind of the agent, Human or Robot. Agents of the same kind are numbered, e.g. Robot 2.
+
+    :param agent: Name of the agent.
+    :type agent: str
+    :rtype: str
+    """
+    return agent.split()[0]
+
 
+def get_param(param_name, config=None):
+    return (config or get_config()).get(param_name)
 
-def set_task_time(task, agent=None, seed=None, fail_prob=None):
-    if seed is None or seed < 0:
-        seed = get_param('Seed')
 
-    if fail_prob is None:
-        fail_prob = get_param('Fail probability')
+def set_task_time(task, job, agent=None, seed=None, fail_prob=None):
+    """
+    Returns the durations of the task from the duration table of the job.
+
+    :param task: Task or its dictionary from the schedule.
+    :type task: Task
+    :param job: Job of the task.
+    :type job: Job
+    :param agent: Name or kind of the agent, defaults to the agent of the task.
+    :type agent: str
+    :param seed: Seed of the durations, defaults to the seed of the job.
+    :type seed: int
+    :param fail_prob: Probabilities of the failed and of the successful execution, defaults to the config.
+    :type fail_prob: list
+    :return: Total duration and durations of preparation, execution and completion.
+    :rtype: list
+    """
+    if seed is not None and seed < 0:
+        seed = None
 
     if isinstance(task, dict):
         if not agent:
             agent = task['Agent']
-        action = task['Action']
         ID = task['ID']
     else:
         if not agent:
             agent = task.agent
-        action = task.action
         ID = task.id
-    duration = get_approximated_task_duration(agent, action)
-    logging.debug(f'{agent}, {action}, {[sum(duration), duration[0], duration[1], duration[2]]}')
-    if duration[0] != 0:
-        scale = 2 if agent == 'Human' else 1
-        for i in range(len(duration)):
-            np.random.seed(seed + ID)
-            # Generate samples from the first Gaussian component
-            samples1 = np.random.normal(loc=duration[i], scale=scale, size=int(fail_prob[1] * 1000))
-            # Generate samples from the second Gaussian component
-            samples2 = np.random.normal(loc=duration[i] * 3, scale=scale * 3, size=int(fail_prob[0] * 1000))
-            # Concatenate the samples from both components
-            samples = np.concatenate((samples1, samples2))
-            # Choice a random value from the concatenated samples
-            sample = int(np.random.choice(samples))
-            if sample <= 0:
-                sample = 1
-            duration[i] = sample
-
-    logging.debug(f'{agent}, {action}, {[sum(duration), duration[0], duration[1], duration[2]]}')
-    return [sum(duration), duration[0], duration[1], duration[2]]
+    duration = job.get_duration_table(seed, fail_prob).get(ID, agent)
+    logging.debug(f'{agent}, {ID}, {duration}')
+    return duration
 
 
 def check_dependencies(job, task):
-    for another_task in job.task_sequence:
-        if (another_task.id in task.conditions) & (another_task.status == 1):
-            return another_task
-    return None
\ No newline at end of file
+    """
+    Returns the first preceding task of the task which is in progress, None if there is none.
+    With the debug logging the result is checked against the scan of all tasks.
+    """
+    dependent_task = job.dependencies.get_in_progress_condition(task)
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        scanned_task = next((another_task for another_task in job.task_sequence
+                             if another_task.id in task.conditions and another_task.status == 1), None)
+        if scanned_task is not dependent_task:
+            logging.error(f'In progress preceding task of task {task.id} is {scanned_task.id if scanned_task else None}'
+                          f', but the dependency index has {dependent_task.id if dependent_task else None}')
+            return scanned_task
+    return dependent_task
\ No newline at end of file
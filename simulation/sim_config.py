@@ -0,0 +1,75 @@
+"""
+    SimConfig class holds the parameters of the simulation loaded from the config file.
+"""
+import collections
+import json
+import os
+
+sim_param_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+# Names of the parameters in the config file
+PARAM_NAMES = {'Seed': 'seed', 'Allocation weights': 'allocation_weights', 'Fail probability': 'fail_probability'}
+
+_default_config = None
+
+
+class SimConfig(collections.namedtuple('SimConfig', PARAM_NAMES.values())):
+    """
+    Immutable parameters of the simulation. The default config is loaded once from the config file,
+    other configs are derived from it with override, e.g. for sweeps over seeds.
+
+    :param seed: Seed of the simulation.
+    :type seed: int
+    :param allocation_weights: Weights of human, robot and universal tasks in the generated cases.
+    :type allocation_weights: tuple
+    :param fail_probability: Probabilities of the failed and of the successful execution.
+    :type fail_probability: tuple
+    """
+    __slots__ = ()
+
+    @classmethod
+    def load(cls, path=sim_param_path):
+        """
+        Loads the config from a json file.
+
+        :param path: Path to the config file.
+        :type path: str
+        :rtype: SimConfig
+        """
+        with open(path) as f:
+            param = json.load(f)
+        return cls(**{field: param[name] for name, field in PARAM_NAMES.items()})._freeze()
+
+    def override(self, **param):
+        """
+        Returns a copy of the config with the given parameters replaced.
+
+        :param param: Parameters to be replaced, e.g. seed=3.
+        :type param: dict
+        :rtype: SimConfig
+        """
+        return self._replace(**param)._freeze()
+
+    def get(self, param_name):
+        """
+        Returns the parameter by its name in the config file.
+
+        :param param_name: Name of the parameter, e.g. Seed.
+        :type param_name: str
+        """
+        return getattr(self, PARAM_NAMES[param_name])
+
+    def _freeze(self):
+        return self._replace(allocation_weights=tuple(self.allocation_weights),
+                             fail_probability=tuple(self.fail_probability))
+
+
+def get_config():
+    """
+    Returns the default config, the config file is read on the first call only.
+
+    :rtype: SimConfig
+    """
+    global _default_config
+    if _default_config is None:
+        _default_config = SimConfig.load()
+    return _default_config
@@ -1,4 +1,6 @@
 # This module defines task execution time constants
+import numpy as np
+
 
 CUBE_ARRAYS = {'Robot': {0: ['r1', 'r2', 'r3', 'r4'],
                          1: ['r5', 'r6', 'r7', 'r8'],
@@ -33,29 +35,128 @@ GO_OVER_TARGET_POSITION = {'Robot': [[2, 3, 3, 4, 5],
 GO_HOME = {'Robot': [2, 3, 3, 4, 5], 'Human': [3, 2, 3, 2, 4]}
 
 
-def get_array_index(dictionary, position):
-    for value in dictionary.values():
-        if position in value:
-            array_index = list(dictionary.keys())[list(dictionary.values()).index(value)]
-            return array_index
-    return None
+GRASP = {'Robot': GO_DOWN + CLOSE_GRIPPER + GO_UP, 'Human': GRASPING}
+RELEASE_CUBE = {'Robot': GO_DOWN + OPEN_GRIPPER + GO_UP, 'Human': RELEASE}
 
 
-def get_approximated_task_duration(agent, action):
-    if ('r' in action['Object'] and agent == 'Robot') or ('h' in action['Object'] and agent == 'Human') \
-            or ('a' in action['Object']):
-        cube_array = get_array_index(CUBE_ARRAYS[agent], action['Object'])
-        position_array = get_array_index(GRID_ARRAYS, action['Place'])
-        if agent == 'Robot':
-            grasping = GO_DOWN + CLOSE_GRIPPER + GO_UP
-            release = GO_DOWN + OPEN_GRIPPER + GO_UP
-        else:
-            grasping = GRASPING
-            release = RELEASE
-        preparation = GO_OVER_CUBE[agent][cube_array] + grasping
-        execution = GO_OVER_TARGET_POSITION[agent][cube_array][position_array] + release
-        completion = GO_HOME[agent][position_array]
-
-        return [preparation, execution, completion]
-    return [0, 0, 0]
+class Workspace:
+    """
+    Durations of the phases of tasks in a workspace. Cubes and places are split into arrays, the durations
+    depend on the array of the cube and on the array of the place. Reverse indexes of the cubes and of the places
+    and the durations of all combinations are precomputed, so the lookup does not scan the arrays.
+
+    :param cube_arrays: Cubes in each array for each kind of agents, a kind of agents can only move its cubes.
+    :type cube_arrays: dict
+    :param grid_arrays: Places in each array.
+    :type grid_arrays: dict
+    :param go_over_cube: Duration of going over a cube in each array for each kind of agents.
+    :type go_over_cube: dict
+    :param go_over_target_position: Duration of going from each cube array to each grid array for each kind.
+    :type go_over_target_position: dict
+    :param go_home: Duration of going home from each grid array for each kind of agents.
+    :type go_home: dict
+    :param grasp: Duration of grasping a cube for each kind of agents.
+    :type grasp: dict
+    :param release: Duration of releasing a cube for each kind of agents.
+    :type release: dict
+    """
+    def __init__(self, cube_arrays, grid_arrays, go_over_cube, go_over_target_position, go_home, grasp=GRASP,
+                 release=RELEASE_CUBE):
+        self.kinds = sorted(cube_arrays)
+        self.cube_index = {kind: get_reverse_index(cube_arrays[kind]) for kind in self.kinds}
+        self.grid_index = get_reverse_index(grid_arrays)
+
+        # Sorted names of cubes and places, so arrays of names are looked up by a binary search
+        self.objects = np.array(sorted(set().union(*self.cube_index.values())))
+        self.places = np.array(sorted(self.grid_index))
+        self.place_array = np.array([self.grid_index[place] for place in self.places])
+        # Cube array of each cube for each kind of agents, -1 if the kind cannot move the cube
+        self.object_array = np.array([[self.cube_index[kind].get(cube, -1) for cube in self.objects]
+                                      for kind in self.kinds])
+
+        # Durations of preparation, execution and completion for each kind, cube array and grid array
+        cube_size = max(len(go_over_cube[kind]) for kind in self.kinds)
+        grid_size = len(grid_arrays)
+        self.durations = np.zeros((len(self.kinds), cube_size, grid_size, 3), dtype=int)
+        for k, kind in enumerate(self.kinds):
+            for cube, go_over in enumerate(go_over_cube[kind]):
+                self.durations[k, cube, :, 0] = go_over + grasp[kind]
+                self.durations[k, cube, :, 1] = np.array(go_over_target_position[kind][cube]) + release[kind]
+                self.durations[k, cube, :, 2] = go_home[kind]
+
+    def get_duration(self, agent, action):
+        """
+        Returns the durations of the phases of the action, zeros if the agent cannot execute it.
+
+        :param agent: Kind of the agent, Human or Robot.
+        :type agent: str
+        :param action: Object and place of the task.
+        :type action: dict
+        :return: Durations of preparation, execution and completion.
+        :rtype: list
+        """
+        cube_array = self.cube_index[agent].get(action['Object'])
+        if cube_array is None:
+            return [0, 0, 0]
+        return self.durations[self.kinds.index(agent), cube_array, self.grid_index[action['Place']]].tolist()
+
+    def get_durations(self, agents, objects, places):
+        """
+        Returns the durations of the phases of many actions at once. Arguments are arrays of the same shape
+        or shapes which can be broadcast together, e.g. agents of shape (1, kinds) and objects and places
+        of shape (tasks, 1) give the durations of all tasks by all kinds of agents.
+
+        :param agents: Kinds of the agents, Human or Robot.
+        :type agents: numpy.ndarray
+        :param objects: Objects of the actions.
+        :type objects: numpy.ndarray
+        :param places: Places of the actions.
+        :type places: numpy.ndarray
+        :return: Array of shape [...] x [preparation, execution, completion], zeros if the agent cannot
+                 execute the action.
+        :rtype: numpy.ndarray
+        """
+        agents, objects, places = np.broadcast_arrays(np.asarray(agents), np.asarray(objects), np.asarray(places))
+        kind = lookup(np.array(self.kinds), agents, 'agent')
+        cube_array = self.object_array[kind, lookup(self.objects, objects, 'object')]
+        grid_array = self.place_array[lookup(self.places, places, 'place')]
+        durations = self.durations[kind, np.maximum(cube_array, 0), grid_array]
+        durations[cube_array < 0] = 0
+        return durations
+
 
+def get_reverse_index(arrays):
+    """
+    Returns the index of the array of each cube or place.
+
+    :param arrays: Cubes or places in each array.
+    :type arrays: dict
+    :rtype: dict
+    """
+    return {position: array_index for array_index, positions in arrays.items() for position in positions}
+
+
+def lookup(names, values, label):
+    """
+    Returns the indexes of the values in the sorted array of names.
+
+    :param names: Sorted array of names.
+    :type names: numpy.ndarray
+    :param values: Names to be looked up.
+    :type values: numpy.ndarray
+    :param label: Label of the names in the error message.
+    :type label: str
+    :rtype: numpy.ndarray
+    """
+    index = np.minimum(np.searchsorted(names, values), len(names) - 1)
+    unknown = names[index] != values
+    if unknown.any():
+        raise ValueError(f'Unknown {label} {values[unknown][0]}')
+    return index
+
+
+WORKSPACE = Workspace(CUBE_ARRAYS, GRID_ARRAYS, GO_OVER_CUBE, GO_OVER_TARGET_POSITION, GO_HOME)
+
+
+def get_approximated_task_duration(agent, action):
+    return WORKSPACE.get_duration(agent, action)
@@ -1,8 +1,10 @@
 import os
 
+from visualization.frame_log import FrameRecorder, read_frames, sim_2_video
 from visualization.graphs import Vis
-from visualization.json_2_video import video_parser
-from visualization.web_visualization import Web_vis
+from visualization.gantt_renderer import GanttRenderer
+from visualization.json_2_video import video_parser, export_video
+from visualization.web_visualization import Web_vis, REFRESH_RATE
 
 initial_and_final_schedule = os.path.join(os.path.dirname(os.path.abspath(__file__)),
                                    'data_for_visualization/initial_and_final_schedule.json')
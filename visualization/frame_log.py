@@ -0,0 +1,93 @@
+"""
+    FrameRecorder class appends the frames of the simulation to a log for the video.
+
+    The log is in the NDJSON format, one frame {"Time": time, "Schedule": {agent: [task, ...]}} per line,
+    so frames are appended without reading the log and replayed one by one.
+"""
+import itertools
+import json
+import os
+
+sim_2_video = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_for_visualization/sim_2_video.ndjson')
+# Size of the write buffer in bytes
+BUFFER_SIZE = 1 << 20
+
+
+class FrameRecorder:
+    """
+    Appends frames to the log through a buffer, the log is opened on the first frame.
+
+    :param path: Path to the log.
+    :type path: str
+    :param overwrite: Remove the existing log before the first frame.
+    :type overwrite: bool
+    :param buffer_size: Size of the write buffer in bytes.
+    :type buffer_size: int
+    """
+    def __init__(self, path=sim_2_video, overwrite=True, buffer_size=BUFFER_SIZE):
+        self.path = path
+        self.overwrite = overwrite
+        self.buffer_size = buffer_size
+        self.file = None
+        self.frames = 0
+
+    def record(self, current_time, schedule):
+        """
+        Appends a frame to the log.
+
+        :param current_time: Time of the frame.
+        :type current_time: int
+        :param schedule: Tasks of each agent as dictionaries.
+        :type schedule: dict
+        """
+        if self.file is None:
+            self.file = open(self.path, 'w' if self.overwrite else 'a', buffering=self.buffer_size)
+        self.file.write(json.dumps({'Time': current_time, 'Schedule': schedule}, separators=(',', ':')))
+        self.file.write('\n')
+        self.frames += 1
+
+    def close(self):
+        """
+        Writes the buffered frames and closes the log.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_frames(path=sim_2_video, start=0, stop=None, step=1):
+    """
+    Reads the frames from the log one by one. Skipped frames are not parsed.
+
+    :param path: Path to the log.
+    :type path: str
+    :param start: Index of the first frame.
+    :type start: int
+    :param stop: Index after the last frame, None for the end of the log.
+    :type stop: int
+    :param step: Read every step-th frame.
+    :type step: int
+    :return: Generator of frames, dictionaries with the time and the schedule.
+    :rtype: generator
+    """
+    with open(path) as f:
+        for line in itertools.islice((line for line in f if line.strip()), start, stop, step):
+            yield json.loads(line)
+
+
+def count_frames(path=sim_2_video):
+    """
+    Returns the number of frames in the log without parsing them.
+
+    :param path: Path to the log.
+    :type path: str
+    :rtype: int
+    """
+    with open(path, 'rb') as f:
+        return sum(1 for line in f if line.strip())
@@ -0,0 +1,128 @@
+"""
+    GanttRenderer class renders the frames of the simulation for the video and reuses its artists.
+"""
+from matplotlib import pyplot as plt
+from matplotlib.patches import Rectangle
+import networkx as nx
+from simulation.sim import get_agent_kind
+from visualization.graphs import Vis, GRAPH_POSITIONS, NODE_SIZE
+
+# Height of a bar of the Gantt chart and width of its black end
+BAR_HEIGHT = 2.4
+END_WIDTH = 0.2
+
+
+class GanttRenderer(Vis):
+    """
+    Renders the Gantt chart and the dependency graph of frames like Vis.plot_schedule. Axes, bars, labels
+    and nodes are created once by build, each frame only updates the geometry and colors of the bars,
+    the colors of the nodes and the current time line. These artists are animated, so they can be blitted
+    over the static background and the cost of a frame does not grow with the number of frames.
+
+    :param horizon: Horizon of the schedule.
+    :type horizon: int
+    """
+    def __init__(self, horizon=None):
+        super().__init__(horizon=horizon)
+        self.bars = {}
+        self.ends = {}
+        self.names = {}
+        self.places = {}
+        self.node_places = []
+        self.nodes = None
+        self.node_labels = []
+        self.time_line = None
+
+    def build(self, schedule):
+        """
+        Creates the axes and the artists of all tasks of the schedule.
+
+        :param schedule: Tasks of each agent as dictionaries, e.g. the schedule of the first frame.
+        :type schedule: dict
+        :return: Animated artists.
+        :rtype: list
+        """
+        self.set_plot_param(211, 'Gantt Chart')
+        graph = nx.DiGraph()
+        labels = {}
+        for tasks in schedule.values():
+            for task in tasks:
+                self.bars[task['ID']] = self.gnt.add_patch(Rectangle((0, 0), 0, BAR_HEIGHT, animated=True))
+                self.ends[task['ID']] = self.gnt.add_patch(Rectangle((0, 0), END_WIDTH, BAR_HEIGHT,
+                                                                     facecolor='black', animated=True))
+                self.names[task['ID']] = self.gnt.text(0, 0, task['Action']['Object'], fontsize=9,
+                                                       rotation='horizontal', animated=True)
+                self.places[task['ID']] = task['Action']['Place']
+                graph.add_node(task['Action']['Place'])
+                labels[task['Action']['Place']] = task['Action']['Object']
+        for tasks in schedule.values():
+            for task in tasks:
+                for condition in task['Conditions']:
+                    if condition in self.places:
+                        graph.add_edge(self.places[condition], task['Action']['Place'])
+        self.time_line = self.gnt.axvline(self.current_time, color='red', lw=2, animated=True)
+
+        sub2 = self.fig.add_subplot(212)
+        sub2.set_title("Dependency graph")
+        self.node_places = list(graph.nodes)
+        nx.draw_networkx_edges(graph, GRAPH_POSITIONS, width=1.0, alpha=0.7, node_size=NODE_SIZE, ax=sub2)
+        self.nodes = nx.draw_networkx_nodes(graph, GRAPH_POSITIONS, nodelist=self.node_places,
+                                            node_color=self.color[None], node_size=NODE_SIZE, ax=sub2)
+        self.nodes.set_animated(True)
+        # Labels are drawn over the nodes, so they are animated as well
+        self.node_labels = list(nx.draw_networkx_labels(graph, GRAPH_POSITIONS, labels, font_size=14,
+                                                        font_color="whitesmoke", ax=sub2).values())
+        for text in self.node_labels:
+            text.set_animated(True)
+
+        plt.tight_layout()
+        plt.legend(handles=self.labels, loc='upper center', bbox_to_anchor=(0.5, -0.05),
+                   fancybox=True, shadow=True, ncol=5)
+        return self.get_artists()
+
+    def update(self, frame):
+        """
+        Updates the artists according to the frame.
+
+        :param frame: Time and tasks of each agent as dictionaries.
+        :type frame: dict
+        :return: Animated artists.
+        :rtype: list
+        """
+        self.current_time = frame['Time']
+        self.data = frame['Schedule']
+        place_status = {}
+        # Overlapping bars are drawn in the order of the frame like in plot_schedule
+        order = 0
+        for agent, tasks in self.data.items():
+            for task in tasks:
+                bar, end, name = self.bars[task['ID']], self.ends[task['ID']], self.names[task['ID']]
+                order += 1
+                bar.set_zorder(1 + order / (2 * len(self.bars) + 1))
+                end.set_zorder(1 + (order + 0.5) / (2 * len(self.bars) + 1))
+                visible = task['Start'] is not None
+                for artist in (bar, end, name):
+                    artist.set_visible(visible)
+                place_status[task['Action']['Place']] = task['Status']
+                if not visible:
+                    continue
+                position_y, task_name_y, action_y = self.y_pos_and_text[task["Universal"]][get_agent_kind(agent)]
+                finish = task['Finish'] if isinstance(task['Finish'], int) else task['Finish'][0]
+                duration = finish - task['Start']
+                bar.set_bounds(task['Start'], position_y - BAR_HEIGHT / 2, duration - END_WIDTH, BAR_HEIGHT)
+                bar.set_facecolor(self.color[task['Status']])
+                end.set_bounds(task['Start'] + duration - END_WIDTH, position_y - BAR_HEIGHT / 2, END_WIDTH,
+                               BAR_HEIGHT)
+                name.set_position((task['Start'] + 0.5, task_name_y))
+        self.time_line.set_xdata([self.current_time, self.current_time])
+        self.nodes.set_facecolor([self.color[place_status.get(place)] for place in self.node_places])
+        return self.get_artists()
+
+    def get_artists(self):
+        """
+        Returns the animated artists in the order in which they are drawn.
+
+        :rtype: list
+        """
+        return list(self.bars.values()) + list(self.ends.values()) + list(self.names.values()) + \
+            [self.time_line, self.nodes] + self.node_labels
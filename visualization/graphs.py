@@ -6,17 +6,28 @@
 """
 import pandas as pd
 from matplotlib import pyplot as plt
-import json
 import os
+import collections
 import networkx as nx
 import matplotlib.patches as mpatches
 from matplotlib.collections import PatchCollection
 import pandas
 import streamlit as st
 import numpy as np
-from simulation.sim import set_task_time
+from simulation.sim import get_agent_kind
+from simulation.duration_table import DurationTable
+from visualization.frame_log import FrameRecorder, sim_2_video
 import altair as alt
 
+# Positions of the places in the dependency graph
+GRAPH_POSITIONS = {'A1': (0, 3), 'B1': (1, 3), 'C1': (2, 3), 'D1': (3, 3),
+                   "A2": (0, 2), 'B2': (1, 2), 'C2': (2, 2), 'D2': (3, 2),
+                   "A3": (0, 1), 'B3': (1, 1), 'C3': (2, 1), 'D3': (3, 1),
+                   "A4": (0, 0), 'B4': (1, 0), 'C4': (2, 0), 'D4': (3, 0)}
+NODE_SIZE = 800
+# Task of a schedule loaded from the file, enough to look up its durations
+PlottedTask = collections.namedtuple('PlottedTask', 'id action')
+
 
 # define an object that will be used by the legend
 class MulticolorPatch(object):
@@ -52,9 +63,11 @@ def get_task_from_id(ID, data):
 
 
 class Vis:
-    def __init__(self, horizon=None, data=None, from_file=False):
+    def __init__(self, horizon=None, data=None, from_file=False, duration_table=None):
+        self.duration_table = duration_table
         self.fig = plt.figure(figsize=(12, 8))
-        self.data4video = './visualization/data_for_visualization/sim_2_video.json'
+        self.data4video = sim_2_video
+        self.recorder = FrameRecorder(self.data4video, overwrite=False)
         self.gnt1 = None
         self.gnt2 = None
         self.data = data
@@ -77,7 +90,24 @@ class Vis:
         self.gs00 = self.gs0[0].subgridspec(2, 1)
         self.legend = True
 
+    def get_duration_table(self, schedules):
+        """
+        Returns the durations of tasks, without the duration table of the job they are sampled once for the
+        plotted tasks.
+
+        :param schedules: Plotted schedules, tasks of each agent.
+        :type schedules: list
+        :rtype: DurationTable
+        """
+        if self.duration_table is None:
+            tasks = {task['ID']: PlottedTask(task['ID'], task['Action'])
+                     for schedule in schedules for agent in schedule for task in schedule[agent]}
+            agents = list(dict.fromkeys(agent for schedule in schedules for agent in schedule))
+            self.duration_table = DurationTable(list(tasks.values()), agents)
+        return self.duration_table
+
     def delete_existing_file(self):
+        self.recorder.close()
         try:
             os.remove(self.data4video)
         except Exception as e:
@@ -155,10 +185,10 @@ class Vis:
             self.set_plot_param(position, title[i])  # [0]
             for agent in local_data[i + index_offset]:
                 for task in local_data[i + index_offset][agent]:
-                    position_y, task_name_y, action_y = self.y_pos_and_text[task["Universal"]][agent]
+                    position_y, task_name_y, action_y = self.y_pos_and_text[task["Universal"]][get_agent_kind(agent)]
 
                     if isinstance(task['Finish'], int):
-                        actions = set_task_time(task)
+                        actions = self.get_duration_table(local_data).get(task['ID'], task['Agent'])
                         duration = task['Finish'] - task['Start']
                         preps_end = task['Start'] + actions[1]
                         execution_end = task['Start'] + actions[1] + actions[2]
@@ -261,15 +291,10 @@ class Vis:
         # st.button("Re-run")
 
     def save_data(self):
-        try:
-            with open(self.data4video, "r+") as json_file:
-                data = json.load(json_file)
-        except Exception as e:
-            data = {}
+        self.recorder.record(self.current_time, self.data)
 
-        data[len(data)] = {'Time': self.current_time, 'Schedule': self.data}
-        with open(self.data4video, 'w') as f:
-            json.dump(data, f, indent=4)
+    def close_data(self):
+        self.recorder.close()
 
     def plot_dependency_graph(self, local_data, position):
         sub2 = self.fig.add_subplot(position)
@@ -290,15 +315,12 @@ class Vis:
                     for j in task["Conditions"]:
                         G.add_edges_from([(get_task_from_id(j, local_data), task["Action"]["Place"])])
 
-        pos = {'A1': (0, 3), 'B1': (1, 3), 'C1': (2, 3), 'D1': (3, 3),
-               "A2": (0, 2), 'B2': (1, 2), 'C2': (2, 2), 'D2': (3, 2),
-               "A3": (0, 1), 'B3': (1, 1), 'C3': (2, 1), 'D3': (3, 1),
-               "A4": (0, 0), 'B4': (1, 0), 'C4': (2, 0), 'D4': (3, 0)}  # positions for all nodes
+        pos = GRAPH_POSITIONS  # positions for all nodes
         # pos = {'A1': (0, 0), 'B1': (0, 2), 'C1': (1, 0), 'D1': (1, 2),
         #        "A2": (0, 1), 'C2': (2, 0), 'D2': (2, 2),
         #        'C3': (3, 0.5), 'D3': (3, 1.5)}  # positions for all nodes
 
-        node_size = 800
+        node_size = NODE_SIZE
         nx.draw_networkx_edges(G, pos, width=1.0, alpha=0.7, node_size=node_size)
         nx.draw_networkx_labels(G, pos, labels, font_size=14, font_color="whitesmoke")
 
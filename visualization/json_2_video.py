@@ -1,35 +1,156 @@
-import json
+import concurrent.futures
+import itertools
 import logging
 import os
+import shutil
+import subprocess
+import tempfile
 
+import matplotlib
 import matplotlib.animation as animation
-import matplotlib.pyplot as plt
-import numpy as np
 
-from visualization.graphs import Vis
+from visualization.frame_log import sim_2_video, read_frames, count_frames
+from visualization.gantt_renderer import GanttRenderer
 
+# Number of chunks of frames for each worker, smaller chunks balance the workers better
+CHUNKS_PER_WORKER = 4
+FRAME_NAME = 'frame_%06d.png'
+# Number of parsed frames between the progress logs
+PROGRESS_INTERVAL = 50
 
-def video_parser():
+
+def video_parser(filename=sim_2_video):
     # animation function
-    data_length = 0
-    def animate(i):
-        print(f'Parsing to video. Progress {100*round(i/data_length,2)}%')
-        plot.data = data[str(i)]["Schedule"]
-        plot.current_time = data[str(i)]["Time"]
-        plot.plot_schedule()
-
-    filename = os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                   'data_for_visualization/sim_2_video.json')
-    with open(filename, "r+") as json_file:
-        data = json.load(json_file)
-    plot = Vis()
-    data_length = len(data)
-
-    print(len(data))
-    # calling the animation function
-    anim = animation.FuncAnimation(plot.fig, animate, interval=200, frames=len(data))
+    def animate(frame):
+        nonlocal i
+        i += 1
+        if i % PROGRESS_INTERVAL == 0 or i == data_length:
+            logging.info(f'Parsing to video. Progress {i}/{data_length}')
+        return plot.update(frame)
+
+    i = 0
+    plot = GanttRenderer()
+    data_length = count_frames(filename)
+    if data_length == 0:
+        raise ValueError(f'The frame log {filename} has no frames')
+    frames = read_frames(filename)
+    first_frame = next(frames)
+    plot.build(first_frame["Schedule"])
+
+    logging.info(f'Number of frames {data_length}')
+    # calling the animation function, frames are read from the log one by one
+    anim = animation.FuncAnimation(plot.fig, animate, interval=200, frames=itertools.chain([first_frame], frames),
+                                   init_func=plot.get_artists, save_count=data_length, cache_frame_data=False,
+                                   blit=True)
 
     # saves the animation in our desktop
     anim.save('growingCoil.mp4', writer='ffmpeg', fps=1)
 
 
+def export_video(filename=sim_2_video, output='growingCoil.mp4', workers=None, stride=1, fps=1, frames_dir=None):
+    """
+    Renders the frames of the log to png images in a pool of processes and assembles them into the video.
+    The log is split into chunks of consecutive frames, each chunk is rendered by one process with the Agg
+    backend. Without ffmpeg the images are kept as an image sequence instead of the video.
+
+    :param filename: Path to the frame log.
+    :type filename: str
+    :param output: Path to the video.
+    :type output: str
+    :param workers: Number of processes, defaults to number of CPUs.
+    :type workers: int
+    :param stride: Render every stride-th frame.
+    :type stride: int
+    :param fps: Frames per second of the video.
+    :type fps: int
+    :param frames_dir: Directory of the images, defaults to a temporary directory, or to the directory next
+                       to the video if ffmpeg is missing. A given directory is kept.
+    :type frames_dir: str
+    :return: Path to the video or to the directory of the images.
+    :rtype: str
+    """
+    frame_count = count_frames(filename)
+    if frame_count == 0:
+        raise ValueError(f'The frame log {filename} has no frames')
+    workers = workers or os.cpu_count() or 1
+    ffmpeg = shutil.which('ffmpeg')
+    temporary = frames_dir is None and ffmpeg is not None
+    if temporary:
+        frames_dir = tempfile.mkdtemp()
+    elif frames_dir is None:
+        frames_dir = os.path.splitext(output)[0] + '_frames'
+    os.makedirs(frames_dir, exist_ok=True)
+
+    try:
+        images = len(range(0, frame_count, stride))
+        chunks = get_chunks(frame_count, stride, workers * CHUNKS_PER_WORKER)
+        rendered = 0
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=matplotlib.use,
+                                                    initargs=('Agg',)) as pool:
+            futures = [pool.submit(render_frames, filename, frames_dir, start, stop, stride, number)
+                       for start, stop, number in chunks]
+            for future in concurrent.futures.as_completed(futures):
+                rendered += future.result()
+                logging.info(f'Rendering frames. Progress {rendered}/{images}')
+
+        if not ffmpeg:
+            logging.warning(f'ffmpeg is missing, the frames are saved to {frames_dir}')
+            return frames_dir
+        subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-framerate', str(fps),
+                        '-i', os.path.join(frames_dir, FRAME_NAME), '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+                        '-pix_fmt', 'yuv420p', output], check=True)
+        return output
+    finally:
+        # Only the temporary directory created here is removed
+        if temporary:
+            shutil.rmtree(frames_dir, ignore_errors=True)
+
+
+def get_chunks(frame_count, stride, chunk_count):
+    """
+    Splits the rendered frames into chunks of consecutive frames.
+
+    :param frame_count: Number of frames in the log.
+    :type frame_count: int
+    :param stride: Render every stride-th frame.
+    :type stride: int
+    :param chunk_count: Maximal number of chunks.
+    :type chunk_count: int
+    :return: Index of the first frame in the log, index after the last frame and number of the first image
+             of each chunk.
+    :rtype: list
+    """
+    images = len(range(0, frame_count, stride))
+    size = max(1, -(-images // chunk_count))
+    return [(number * stride, min((number + size) * stride, frame_count), number)
+            for number in range(0, images, size)]
+
+
+def render_frames(filename, frames_dir, start, stop, stride, number):
+    """
+    Renders the frames of a chunk to numbered png images. Runs in a worker process.
+
+    :param filename: Path to the frame log.
+    :type filename: str
+    :param frames_dir: Directory of the images.
+    :type frames_dir: str
+    :param start: Index of the first frame in the log.
+    :type start: int
+    :param stop: Index after the last frame.
+    :type stop: int
+    :param stride: Render every stride-th frame.
+    :type stride: int
+    :param number: Number of the first image.
+    :type number: int
+    :return: Number of rendered frames.
+    :rtype: int
+    """
+    plot = GanttRenderer()
+    # The first frame of the log contains all tasks
+    plot.build(next(read_frames(filename))["Schedule"])
+    count = 0
+    for frame in read_frames(filename, start, stop, stride):
+        plot.update(frame)
+        plot.fig.savefig(os.path.join(frames_dir, FRAME_NAME % (number + count)))
+        count += 1
+    return count
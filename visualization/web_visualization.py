@@ -1,21 +1,46 @@
+import time
+
 import streamlit as st
+from streamlit.delta_generator import DeltaGenerator
 import altair as alt
 import pandas as pd
-from graphviz import Digraph
+
+# Maximal number of refreshes of the charts per second
+REFRESH_RATE = 2
+# add_rows has been removed from the newer versions of Streamlit
+ADD_ROWS = hasattr(DeltaGenerator, 'add_rows')
+
 
 class Web_vis:
+    """
+    Shows the schedule in the web visualization. The table of tasks, the chart spec and the DOT graph are built
+    once, each refresh applies only the tasks whose status, start, end or agent has changed. Where Streamlit
+    supports add_rows, the chart is drawn once and each refresh appends only the changed tasks and the current
+    time with a new version, the chart shows the latest version of each. Otherwise the whole table is sent on
+    each refresh. Refreshes are throttled to the refresh rate.
 
-    def __init__(self, data=None):
-        self.robot_text = st.empty()
-        self.robot_text.text("Robot: ")
-        self.human_text = st.empty()
-        self.human_text.text("Human: ")
+    :param data: Schedule as a dictionary of columns, see ControlLogic.schedule_as_dict.
+    :type data: dict
+    :param refresh_rate: Maximal number of refreshes per second, None for no limit.
+    :type refresh_rate: float
+    :param agents: Names of the agents, each agent has its own text. Texts of other agents are added on their
+                   first update.
+    :type agents: list
+    """
+    def __init__(self, data=None, refresh_rate=REFRESH_RATE, agents=None):
+        # Texts of agents are kept above the charts
+        self.agent_container = st.container()
+        self.agent_texts = {}
+        for name in agents or []:
+            self.get_agent_text(name).text(f"{name}: ")
         # Create an empty placeholder for the chart
         self.chart_placeholder = st.empty()
         # Create a directed graph
         self.graph_placeholder = st.empty()
         self.current_time = 0
         self.data = data
+        self.refresh_rate = refresh_rate
+        self.last_refresh = None
         # Mapping dictionary for Status values
         self.status_mapping = {
             2: "Completed",
@@ -31,59 +56,203 @@ class Web_vis:
             'Available': '#ff7f0e',
             'Not available': '#d62728'
         }
+        # Cached tasks and their rows (status, start, end, agent) by ID
+        self.tasks = None
+        self.rows = {}
+        self.spec = None
+        # Drawn chart and the version of the rows appended to it
+        self.chart = None
+        self.version = 0
+        self.nodes = {}
+        self.edges = []
+        self.graph_changed = True
+        # Shown text of each agent
+        self.texts = {}
+        if data is not None:
+            self.set_data(data)
 
+    def set_data(self, data):
+        """
+        Builds the table of tasks, the chart spec and the DOT graph of the schedule.
 
-    def update_gantt_chart(self):
-        pandas_data = pd.DataFrame({
-            "Status": self.data['Status'],
-            "Start": self.data['Start'],
-            "End": self.data['End'],
-            "Agent": self.data['Agent']
-        })
-        pandas_data["Status"] = pandas_data["Status"].map(self.status_mapping)
-        bar_chart = alt.Chart(pandas_data).mark_bar().encode(
+        :param data: Schedule as a dictionary of columns, see ControlLogic.schedule_as_dict.
+        :type data: dict
+        """
+        self.data = data
+        self.tasks = pd.DataFrame({
+            "ID": data['ID'],
+            "Status": [self.status_mapping.get(status) for status in data['Status']],
+            "Start": data['Start'],
+            "End": data['End'],
+            "Agent": data['Agent'],
+            "Version": 0
+        }, index=data['ID']).astype({"Start": float, "End": float})
+        self.chart = None
+        self.version = 0
+        self.rows = {task_id: row for task_id, *row in zip(data['ID'], data['Status'], data['Start'],
+                                                          data['End'], data['Agent'])}
+
+        # Only the latest version of each task and of the current time is shown
+        bar_chart = alt.Chart(alt.NamedData('tasks')).transform_joinaggregate(
+            Latest='max(Version)', groupby=['ID']
+        ).transform_filter('datum.Version == datum.Latest').mark_bar().encode(
             y=alt.X('Agent:N', title='Agents'),
             x=alt.X('Start:Q', title='Time [s]'),
             x2='End:Q',
             color=alt.Color('Status:N', title='Status',
                             scale=alt.Scale(
-                                domain=['Completed', 'In progress', 'Available', 'Not available'],
-                                range=['#1f77b4', '#2ca02c', '#ff7f0e', '#d62728']
+                                domain=list(self.status_colors.keys()),
+                                range=list(self.status_colors.values())
                             )))
-        current_time_rule = alt.Chart(pd.DataFrame({'current_time': [self.current_time]})).mark_rule(
-            color='red').encode(
-            x='current_time',
+        current_time_rule = alt.Chart(alt.NamedData('time')).transform_joinaggregate(
+            Latest='max(Version)'
+        ).transform_filter('datum.Version == datum.Latest').mark_rule(color='red').encode(
+            x='current_time:Q',
             size=alt.value(2)
         )
-        self.chart_placeholder.altair_chart(bar_chart + current_time_rule, use_container_width=True)
+        self.spec = alt.layer(bar_chart, current_time_rule).to_dict()
+
+        self.nodes = {task_id: self.get_node(task_id, status) for task_id, status in zip(data['ID'], data['Status'])}
+        self.edges = [f'\t{condition} -> {task_id}\n' for task_id, conditions in zip(data['ID'], data['Conditions'])
+                      for condition in conditions]
+        self.graph_changed = True
+
+    def get_node(self, task_id, status):
+        """
+        Returns the DOT line of the task node colored by its status.
+
+        :param task_id: ID of the task.
+        :type task_id: int
+        :param status: Status of the task.
+        :type status: int
+        :rtype: str
+        """
+        node_color = self.status_colors.get(self.status_mapping.get(status), "gray")
+        return f'\t{task_id} [color="{node_color}" style=filled]\n'
+
+    def update_tasks(self, rows):
+        """
+        Applies the changed tasks to the cached table and graph.
+
+        :param rows: Tasks as (ID, status, start, end, agent).
+        :type rows: iterable
+        :return: IDs of the changed tasks.
+        :rtype: list
+        """
+        changed = []
+        for task_id, *row in rows:
+            old_row = self.rows.get(task_id)
+            if old_row != row:
+                self.rows[task_id] = row
+                changed.append([task_id] + row)
+                if old_row is None or old_row[0] != row[0]:
+                    self.nodes[task_id] = self.get_node(task_id, row[0])
+                    self.graph_changed = True
+        if not changed:
+            return []
+        ids, status, start, end, agent = zip(*changed)
+        self.tasks.loc[list(ids), ["Status", "Start", "End", "Agent", "Version"]] = list(zip(
+            [self.status_mapping.get(s) for s in status], start, end, agent, [self.version + 1] * len(ids)))
+        return list(ids)
+
+    def is_due(self):
+        """
+        Returns whether the refresh rate allows the next refresh.
+
+        :rtype: bool
+        """
+        return self.refresh_rate is None or self.last_refresh is None or \
+            time.monotonic() - self.last_refresh >= 1 / self.refresh_rate
+
+    def get_wait_time(self):
+        """
+        Returns the time until the refresh rate allows the next refresh.
+
+        :return: Time in seconds.
+        :rtype: float
+        """
+        if self.refresh_rate is None or self.last_refresh is None:
+            return 0
+        return max(0.0, self.last_refresh + 1 / self.refresh_rate - time.monotonic())
+
+    def refresh(self, current_time, rows, force=False):
+        """
+        Applies the changed tasks and redraws the charts if the refresh is due.
+
+        :param current_time: Current time of the simulation.
+        :type current_time: int
+        :param rows: Tasks as (ID, status, start, end, agent), read only if the refresh is due.
+        :type rows: iterable
+        :param force: Refresh regardless of the refresh rate, e.g. for the final schedule.
+        :type force: bool
+        :return: True if the charts were refreshed.
+        :rtype: bool
+        """
+        if not (force or self.is_due()):
+            return False
+        self.last_refresh = time.monotonic()
+        self.current_time = current_time
+        self.update_gantt_chart(self.update_tasks(rows))
+        if self.graph_changed:
+            self.update_dependency_graph()
+        return True
+
+    def update_gantt_chart(self, changed=None):
+        """
+        Appends the changed tasks and the current time to the drawn chart, draws the whole chart if Streamlit
+        cannot append rows.
+
+        :param changed: IDs of the changed tasks.
+        :type changed: list
+        """
+        self.version += 1
+        current_time = pd.DataFrame({'current_time': [self.current_time], 'Version': [self.version]})
+        if self.chart is not None and ADD_ROWS:
+            if changed:
+                self.chart.add_rows(tasks=self.tasks.loc[changed])
+            self.chart.add_rows(time=current_time)
+        else:
+            self.chart = self.chart_placeholder.vega_lite_chart(
+                spec=dict(self.spec, datasets={'tasks': self.tasks, 'time': current_time}), use_container_width=True)
 
     def update_dependency_graph(self):
-        pandas_data = pd.DataFrame({
-            "Status": self.data['Status'],
-            "ID": self.data['ID'],
-            "Conditions": self.data['Conditions']})
-        pandas_data["Status"] = pandas_data["Status"].map(self.status_mapping)
-        graph = Digraph('Dependency Graph')
-        # Add nodes to the graph with colors based on 'Status'
-        for index, row in pandas_data.iterrows():
-            node_color = self.status_colors.get(row["Status"], "gray")
-            graph.node(str(row["ID"]), color=node_color, style="filled")
-
-        # Add edges between tasks based on 'Conditions'
-        for index, row in pandas_data.iterrows():
-            for condition in row["Conditions"]:
-                graph.edge(str(condition), str(row["ID"]))
-
-        # Display the Graphviz graph using Streamlit
-        self.graph_placeholder.graphviz_chart(graph)
+        # Display the DOT graph using Streamlit
+        self.graph_placeholder.graphviz_chart('digraph "Dependency Graph" {\n' + ''.join(self.nodes.values()) +
+                                              ''.join(self.edges) + '}\n')
+        self.graph_changed = False
 
     def update_info(self, agent, start=False):
         if start:
-            string = f"{agent.name}: place {agent.current_task.action['Object']} to {agent.current_task.action['Place']}.   " \
-                     f"Task ID: {agent.current_task.id}"
+            self.update_agent(agent.name, (agent.current_task.action['Object'], agent.current_task.action['Place'],
+                                           agent.current_task.id))
         else:
-            string = f"{agent.name}: waiting for task"
-        if agent.name == 'Robot':
-            self.robot_text.text(string)
+            self.update_agent(agent.name, None)
+
+    def update_agent(self, name, task):
+        """
+        Shows the current task of the agent, the text is redrawn only when it changes.
+
+        :param name: Name of the agent.
+        :type name: str
+        :param task: Object, place and ID of the current task, None for a waiting agent.
+        :type task: tuple
+        """
+        if task:
+            string = f"{name}: place {task[0]} to {task[1]}.   Task ID: {task[2]}"
         else:
-            self.human_text.text(string)
+            string = f"{name}: waiting for task"
+        if self.texts.get(name) != string:
+            self.texts[name] = string
+            self.get_agent_text(name).text(string)
+
+    def get_agent_text(self, name):
+        """
+        Returns the placeholder of the text of the agent, it is created on the first call.
+
+        :param name: Name of the agent.
+        :type name: str
+        :rtype: DeltaGenerator
+        """
+        if name not in self.agent_texts:
+            self.agent_texts[name] = self.agent_container.empty()
+        return self.agent_texts[name]